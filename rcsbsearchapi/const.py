@@ -1,3 +1,4 @@
+# Deprecated and unused: throttled requests are now retried by the HTTP session of search.py (see HTTP_RETRY_*)
 REQUESTS_PER_SECOND = 10
 STRUCTURE_INDEX = 0
 CHEMICAL_INDEX = 0
@@ -22,3 +23,10 @@ STRUCT_MOTIF_MAX_RESIDUES = 10
 RCSB_SEARCH_API_QUERY_URL = "https://search.rcsb.org/rcsbsearch/v2/query"
 UPLOAD_URL = "https://user-upload.rcsb.org/v1/putMultipart"
 RETURN_UP_URL = "https://user-upload.rcsb.org/v1/download/"
+HTTP_RETRY_TOTAL = 5
+HTTP_RETRY_BACKOFF_FACTOR = 0.5
+HTTP_RETRY_STATUS_CODES = [429, 502, 503, 504]
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 32
+SEARCH_CACHE_ENV = "RCSBSEARCH_CACHE"
+SEARCH_CACHE_SIZE = 512
@@ -19,6 +19,12 @@ from .const import (
     CHEMICAL_ATTRIBUTE_SCHEMA_FILE,
 )
 
+# orjson is optional, and used for faster parsing of the (large) attribute schemas if available
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
 
 class SchemaGroup:
     """A non-leaf node in the RCSB PDB schema. Leaves are Attr values."""
@@ -220,7 +226,7 @@ class Schema:
         logging.info("Requesting %s", url)
         response = requests.get(url, timeout=None)
         if response.status_code == 200:
-            return response.json()
+            return orjson.loads(response.content) if orjson is not None else response.json()
         else:
             logging.debug("HTTP response status code %r", response.status_code)
             return None
@@ -228,7 +234,7 @@ class Schema:
     def _load_json_schema(self, schema_file):
         logging.info("Loading attribute schema from file")
         latest = pkgutil.get_data(__package__, schema_file)
-        return json.loads(latest)
+        return orjson.loads(latest) if orjson is not None else json.loads(latest)
 
     def _make_group(self, fullname: str, nodeL: List):
         """Represent this node of the schema as a python object
@@ -3,13 +3,14 @@
 
 from __future__ import annotations
 import functools
+import hashlib
 import json
 import logging
 import math
+import os
 import sys
 import urllib.parse
 import uuid
-import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, fields, is_dataclass
 from datetime import date
@@ -29,15 +30,26 @@ from typing import (
 )
 
 import requests
-from .const import STRUCTURE_ATTRIBUTE_SEARCH_SERVICE, REQUESTS_PER_SECOND, FULL_TEXT_SEARCH_SERVICE, SEQUENCE_SEARCH_SERVICE, SEQUENCE_SEARCH_MIN_NUM_OF_RESIDUES
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+from .const import STRUCTURE_ATTRIBUTE_SEARCH_SERVICE, FULL_TEXT_SEARCH_SERVICE, SEQUENCE_SEARCH_SERVICE, SEQUENCE_SEARCH_MIN_NUM_OF_RESIDUES
 from .const import RCSB_SEARCH_API_QUERY_URL, SEQMOTIF_SEARCH_SERVICE, SEQMOTIF_SEARCH_MIN_CHARACTERS, UPLOAD_URL, RETURN_UP_URL, STRUCT_SIM_SEARCH_SERVICE
 from .const import STRUCTMOTIF_SEARCH_SERVICE, STRUCT_MOTIF_MIN_RESIDUES, STRUCT_MOTIF_MAX_RESIDUES, CHEM_SIM_SEARCH_SERVICE
+from .const import HTTP_RETRY_TOTAL, HTTP_RETRY_BACKOFF_FACTOR, HTTP_RETRY_STATUS_CODES
+from .const import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, SEARCH_CACHE_ENV, SEARCH_CACHE_SIZE
 from .schema import Schema
 
 if sys.version_info > (3, 8):
-    from typing import Literal
+    from typing import Literal, get_args
 else:
-    from typing_extensions import Literal
+    from typing_extensions import Literal, get_args
+
+# orjson is optional, and used for faster (de)serialization of search requests and results if available
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
 
 # tqdm is optional
 # Allowed return types for searches. https://search.rcsb.org/#return-type
@@ -123,18 +135,142 @@ TValue = Union[
 TNumberLike = Union[int, float, date, "Value[int]", "Value[float]", "Value[date]"]
 
 
+def _make_http_session() -> requests.Session:
+    """Create the HTTP session shared by all requests to the RCSB PDB services.
+
+    Connections are pooled and kept alive between requests, with enough pooled
+    connections per host for queries issued from several threads. The pool blocks
+    once all its connections are in use, so concurrent callers wait for a free
+    connection instead of opening ever more connections to the server. Responses indicating
+    that the server is throttling (429) or temporarily unavailable (502, 503, 504) are retried
+    with exponential backoff by urllib3, honoring any Retry-After header. Once the
+    retries are exhausted the last response is returned as-is, so callers still see
+    the usual HTTPError from `raise_for_status`.
+
+    Compressed responses are requested explicitly, as some proxies strip the header, using
+    every encoding urllib3 can decode here (brotli and zstd too, if their packages are installed).
+    """
+    retry = Retry(
+        total=HTTP_RETRY_TOTAL,
+        backoff_factor=HTTP_RETRY_BACKOFF_FACTOR,
+        status_forcelist=HTTP_RETRY_STATUS_CODES,
+        allowed_methods=["GET", "POST"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.headers.update(make_headers(accept_encoding=True))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+HTTP_SESSION = _make_http_session()
+
+
+def _json_loads(data: Union[bytes, str]) -> Any:
+    """Deserialize a JSON document, using orjson if it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_default(obj: Any) -> Any:
+    """Serialize dates as ISO 8601 strings, as orjson does, when falling back to json"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Serialize an object to a compact JSON string, using orjson if it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else None).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys, default=_json_default)
+
+
+def _search_request(url: str, params_json: str) -> Tuple[int, bytes]:
+    """Send a search request, and return the status code and raw content of the response"""
+    response = HTTP_SESSION.get(url, {"json": params_json}, headers={"Accept": "application/json"}, timeout=None)
+    response.raise_for_status()
+    return response.status_code, response.content
+
+
+@functools.lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def _cached_search_request(url: str, cache_key: str) -> Tuple[int, bytes]:
+    """Send a search request given as canonical JSON without its request_info, and
+    remember the response. Identical requests made by different sessions then only
+    reach the server once. Failed requests raise, and are not cached.
+
+    Only used if the RCSBSEARCH_CACHE environment variable is set to 1.
+    """
+    params = _json_loads(cache_key)
+    params["request_info"] = dict(query_id=Session.make_uuid(), src="ui")
+    return _search_request(url, _json_dumps(params))
+
+
+# URLs of files uploaded by fileUpload, by (SHA-256 digest of the file content, file format)
+_UPLOADED_FILES: Dict[Tuple[str, str], str] = {}
+
+
+def _file_digest(filepath: str) -> str:
+    """Hex SHA-256 digest of the content of a file. The digest is only computed
+    again if the file was modified since it was last hashed."""
+    stat = os.stat(filepath)
+    return _cached_file_digest(os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_file_digest(filepath: str, mtime_ns: int, size: int) -> str:  # pylint: disable=unused-argument
+    """Hex SHA-256 digest of a file, remembered by path, modification time and size"""
+    digest = hashlib.sha256()
+    with open(filepath, mode="rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_downloadable(url: str) -> bool:
+    """Check with a HEAD request whether a previously uploaded file is still available"""
+    try:
+        return HTTP_SESSION.head(url, timeout=30).ok
+    except requests.exceptions.RequestException:
+        return False
+
+
 def fileUpload(filepath: str, fmt: str = "cif") -> str:
     """Take a file given by a filepath, and return the
     corresponding URL to use in a structure search. This URL
     should then be passed through as part of the value parameter,
-    along with the format of the file."""
+    along with the format of the file.
+
+    Uploading a file with the same content and format again returns
+    the previous URL, as long as the upload is still available."""
+    upload_key = (_file_digest(filepath), fmt)
+    url = _UPLOADED_FILES.get(upload_key)
+    if url is not None and _is_downloadable(url):
+        return url
     with open(filepath, mode="rb") as f:
-        res = requests.post(UPLOAD_URL, files={"file": f}, data={"format": fmt}, timeout=None)
+        res = HTTP_SESSION.post(UPLOAD_URL, files={"file": f}, data={"format": fmt}, timeout=None)
         try:
-            spec = res.json()["key"]
+            spec = _json_loads(res.content)["key"]
         except KeyError:
             raise TypeError("There was an issue processing the file. Check the file format.")
-    return RETURN_UP_URL + spec
+    url = RETURN_UP_URL + spec
+    _UPLOADED_FILES[upload_key] = url
+    return url
+
+
+def _url_file_format(url: Optional[str]) -> Optional[str]:
+    """Guess the structure file format ("cif", "pdb" or "bcif") from the extension of a (possibly gzipped) file url"""
+    if not url:
+        return None
+    path = urllib.parse.urlparse(url).path.lower()
+    if path.endswith(".gz"):
+        path = path[:-3]
+    ext = os.path.splitext(path)[1].lstrip(".")
+    return ext if ext in ("cif", "pdb", "bcif") else None
 
 
 class Query(ABC):
@@ -162,7 +298,17 @@ class Query(ABC):
 
     def to_json(self) -> str:
         """Get JSON string of this query"""
-        return json.dumps(self.to_dict(), separators=(",", ":"))
+        return _json_dumps(self.body)
+
+    @functools.cached_property
+    def body(self) -> Dict:
+        """Dictionary representing this query, built once and then reused.
+
+        As queries are immutable, the same dictionary is used for every request made
+        with this query (e.g. for each page of results). It should not be modified;
+        use `to_dict` to get a new copy.
+        """
+        return self.to_dict()
 
     @abstractmethod
     def _assign_ids(self, node_id=0) -> Tuple["Query", int]:
@@ -240,7 +386,7 @@ class Query(ABC):
             scoring_strategy=scoring_strategy,
         )
 
-        response = session.to_dict()
+        response = session._fetch_first_page()  # pylint: disable=protected-access
 
         # If return_counts exists, return only the total count
         if return_counts:
@@ -294,6 +440,14 @@ class Query(ABC):
             scoring_strategy=scoring_strategy,
         )
 
+    def build_params(self, **kwargs) -> Dict:
+        """Build the search request parameters for this query without sending the request.
+
+        Takes the same request options as `exec`, and applies the same adjustments to them
+        (e.g. the return_type required by a group_by aggregation method).
+        """
+        return Session(self, **kwargs)._make_params()
+
     @overload
     def and_(self, other: "Query") -> "Query":
         ...
@@ -826,6 +980,9 @@ class StructSimilarityQuery(Terminal):
                 parameters["value"] = {"entry_id": entry_id, "asym_id": chain_id}
 
         elif structure_search_type == "file_url":
+            url_format = _url_file_format(file_url)
+            if url_format and file_format and url_format != file_format:
+                raise ValueError(f"file_format '{file_format}' does not match the extension of file_url '{file_url}'")
             parameters["value"] = {"url": file_url, "format": file_format}
 
         elif structure_search_type == "file_upload":
@@ -1007,6 +1164,11 @@ class ChemSimilarityQuery(Terminal):
             parameters["match_subset"] = match_subset
 
         elif query_type == "descriptor":
+            if descriptor_type not in get_args(SubsetDescriptorType):
+                raise ValueError(f"Invalid descriptor_type '{descriptor_type}', must be one of {get_args(SubsetDescriptorType)}")
+            # match_type is optional, leaving the choice of matching to the search API
+            if match_type is not None and match_type not in get_args(ChemSimMatchType):
+                raise ValueError(f"Invalid match_type '{match_type}', must be one of {get_args(ChemSimMatchType)}")
             parameters["descriptor_type"] = descriptor_type
             parameters["match_type"] = match_type
 
@@ -1678,6 +1840,9 @@ class Session(Iterable[str]):
         self.count: Optional[int] = None
         self.explain_metadata: Optional[Dict] = None
 
+        # response to the first page of results fetched by Query.exec, reused once by the iterator
+        self._first_response: Optional[Dict] = None
+
     @staticmethod
     def make_uuid() -> str:
         "Create a new UUID to identify a query"
@@ -1744,7 +1909,7 @@ class Session(Iterable[str]):
             request_options_dict["scoring_strategy"] = self._scoring_strategy
 
         query_dict = dict(
-            query=self.query.to_dict(),
+            query=self.query.body,
             return_type=self.return_type,
             request_info=dict(query_id=self.query_id, src="ui"),  # "TODO" src deprecated?
             # v1 -> v2: pager parameter is renamed to paginate and results_content_type parameter added (which has a list as its value)
@@ -1756,20 +1921,31 @@ class Session(Iterable[str]):
         "Fires a single query"
         params = self._make_params(start)
         logging.debug("Querying %s for results %s-%s", self.url, start, start + self.rows - 1)
-        response = requests.get(self.url, {"json": json.dumps(params, separators=(",", ":"))}, timeout=None)
-        response.raise_for_status()
-        if response.status_code == requests.codes.ok:
-            return response.json()
-        elif response.status_code == requests.codes.no_content:
+        if os.environ.get(SEARCH_CACHE_ENV) == "1":
+            # query_id differs between sessions, so it is left out of the cache key
+            cache_key = _json_dumps({k: v for k, v in params.items() if k != "request_info"}, sort_keys=True)
+            status_code, content = _cached_search_request(self.url, cache_key)
+        else:
+            status_code, content = _search_request(self.url, _json_dumps(params))
+        if status_code == requests.codes.ok:
+            return _json_loads(content)
+        elif status_code == requests.codes.no_content:
             return None
         else:
-            raise requests.HTTPError(f"Unexpected status: {response.status_code}")
+            raise requests.HTTPError(f"Unexpected status: {status_code}")
+
+    def _first_page(self) -> Optional[Dict]:
+        """Response for the first page of results, reusing the one already fetched by
+        `_fetch_first_page` (when the query was executed) rather than requesting it again"""
+        if self._first_response is not None:
+            response, self._first_response = self._first_response, None
+            return response
+        return self._single_query(start=0)
 
     def __iter__(self) -> Union[Iterator[str], Iterator]:
         "Generator for all results as a list of identifiers"
         start = 0
-        req_count = 0
-        response = self._single_query(start=start)
+        response = self._first_page()
         if response is None:
             return  # be explicit for mypy
         if "result_set" in response:
@@ -1792,10 +1968,9 @@ class Session(Iterable[str]):
             # If grouping is applied, result set could be lower than rows
             if not self._group_by:
                 assert len(result_set) == self.rows
-            req_count += 1
-            if req_count == REQUESTS_PER_SECOND:
-                time.sleep(1.2)  # This prevents the user from bottlenecking the server with requests.
-                req_count = 0
+            # Release the consumed page before fetching the next, so only one page is held at a time
+            del response, result_set
+            # Throttling by the server (429) is handled by the retry policy of HTTP_SESSION
             response = self._single_query(start=start)
             assert isinstance(response, dict)
             if "result_set" in response:
@@ -1808,6 +1983,16 @@ class Session(Iterable[str]):
             start += self.rows
             yield from result_set
 
+    def _fetch_first_page(self) -> Dict:
+        """Request the first page of results, and keep it for the first iteration over the
+        session (or `iquery`). Only used by `Query.exec`, which reads from it but doesn't hand
+        it out, so the kept response can't be modified by the caller."""
+        response = self._single_query()
+        if not isinstance(response, Dict):
+            return {}
+        self._first_response = response
+        return response
+
     def to_dict(self) -> Dict:
         """return full json response"""
         response = self._single_query()
@@ -1822,7 +2007,7 @@ class Session(Iterable[str]):
         """
         from tqdm import trange  # type: ignore
 
-        response = self._single_query(start=0)
+        response = self._first_page()
         if response is None:
             return []
         total = response["total_count"]
@@ -66,8 +66,9 @@ setup(
     extras_require={
         "dev": ["check-manifest"],
         "test": ["coverage"],
-        "tests": ["tox", "pylint", "black>=21.5b1", "flake8"],
+        "tests": ["tox", "pylint", "black>=21.5b1", "flake8", "pytest", "pytest-xdist"],
         "progressbar": ["tqdm"],
+        "orjson": ["orjson"],
         # should match docs/requirements.txt
         "docs": ["sphinx", "sphinx-rtd-theme", "myst-parser"],
     },
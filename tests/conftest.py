@@ -0,0 +1,33 @@
+##
+# File:    conftest.py
+# Date:    16-Oct-2026
+#
+# Update:
+#
+#
+##
+"""
+pytest configuration for the test suite.
+
+The tests are plain unittest test cases so that they also run under `python -m unittest`,
+so pytest markers are applied here rather than in the test modules. The suite can be
+distributed over workers with pytest-xdist, e.g. `pytest -n auto tests`. Workers are separate
+processes, so the state that tests share is per worker: the RCSBSEARCH_CACHE environment
+variable set for the test class, patches of `rcsbsearchapi.search.HTTP_SESSION`, and the
+module-level caches of search responses (`_cached_search_request`), uploaded files
+(`_UPLOADED_FILES`) and test queries (`_entry_in`). Within each worker, requests share the
+pooled connections of `HTTP_SESSION`, whose blocking pool bounds the concurrent requests and
+whose retry policy backs off when the search API throttles (429).
+"""
+
+import pytest
+
+# Tests issuing many or large requests to the search API. Select with `-m slow` or deselect
+# with `-m "not slow"` to run them separately (e.g. on dedicated CI workers).
+SLOW_TESTS = {"testCSMquery"}
+
+
+def pytest_collection_modifyitems(config, items):  # pylint: disable=unused-argument
+    for item in items:
+        if item.name in SLOW_TESTS:
+            item.add_marker(pytest.mark.slow)
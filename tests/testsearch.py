@@ -17,16 +17,35 @@ __author__ = "Santiago Blaumann"
 __email__ = "santiago.blaumann@rcsb.org"
 __license__ = "BSD 3-Clause"
 
+import contextlib
+import functools
+import io
+import json
 import logging
 import platform
 import resource
 import time
 import unittest
+import urllib.parse
 import os
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 from itertools import islice
+from types import SimpleNamespace
+from unittest import mock
 import requests
-from rcsbsearchapi.const import CHEMICAL_ATTRIBUTE_SEARCH_SERVICE, STRUCTURE_ATTRIBUTE_SEARCH_SERVICE, RETURN_UP_URL
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# requests-cache is optional, and only used if RCSB_TEST_CACHE is set (to 1 or replay)
+try:
+    import requests_cache  # type: ignore
+except ImportError:
+    requests_cache = None
+from rcsbsearchapi.const import CHEMICAL_ATTRIBUTE_SEARCH_SERVICE, STRUCTURE_ATTRIBUTE_SEARCH_SERVICE, RETURN_UP_URL, SEARCH_CACHE_ENV, RCSB_SEARCH_API_QUERY_URL
+from rcsbsearchapi.const import HTTP_RETRY_TOTAL, HTTP_RETRY_BACKOFF_FACTOR, HTTP_RETRY_STATUS_CODES
 from rcsbsearchapi import Attr, Group, TextQuery
+from rcsbsearchapi import search
 from rcsbsearchapi import rcsb_attributes as attrs
 from rcsbsearchapi.search import PartialQuery, Terminal, AttributeQuery, SequenceQuery, SeqMotifQuery, StructSimilarityQuery, fileUpload, StructureMotifResidue, StructMotifQuery
 from rcsbsearchapi.search import Session, Value
@@ -35,34 +54,333 @@ from rcsbsearchapi.search import Facet, Range, TerminalFilter, GroupFilter, Filt
 from rcsbsearchapi.search import Sort
 from rcsbsearchapi.search import GroupBy, RankingCriteriaType
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s]-%(module)s.%(funcName)s: %(message)s")
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Attributes used by several tests, looked up in the schema once
+_RCSB_ID = attrs.rcsb_entry_container_identifiers.rcsb_id
+_AUTHORS = attrs.citation.rcsb_authors
+_TITLE = attrs.struct.title
+_SYM_SYMBOL = attrs.rcsb_struct_symmetry.symbol
+_SYM_KIND = attrs.rcsb_struct_symmetry.kind
+_SYM_TYPE = attrs.rcsb_struct_symmetry.type
+_DNA_COUNT = attrs.rcsb_entry_info.polymer_entity_count_DNA
+_CHEM_NAME = attrs.chem_comp.name
+
+# Human hemoglobin alpha chain, used by the sequence search tests
+_HBB_ALPHA = "VLSPADKTNVKAAWGKVGAHAGEYGAEALERMFLSFPTTKTYFPHFDLSHGSAQVKGHGKKVADALTNAVAHVDDMPNALSALSDLHAHKLRVDPVNFKLLSHCLLVTLAAHLPAEFTPAVHASLDKFLASVSTVLTSKYR"
+
+# (attribute, operator, value) of the terminals combined step by step in testPartialQuery
+_PARTIAL_QUERY_TERMINALS = [("a", "equals", "aval"), ("b", "exact_match", "bval"), ("c", "less", 5)]
+
+_FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "files")
+# Structure files used by the upload and structure search tests
+_4HHB_BCIF = os.path.join(_FILES_DIR, "4hhb.bcif")
+_4HHB_CIF = os.path.join(_FILES_DIR, "4hhb.cif")
+_4HHB_PDB = os.path.join(_FILES_DIR, "4hhb.pdb")
+_7N0R_PDB_GZ = os.path.join(_FILES_DIR, "7n0r.pdb.gz")
+_7N0R_CIF_GZ = os.path.join(_FILES_DIR, "7n0r.cif.gz")
+_INVALID_TXT = os.path.join(_FILES_DIR, "invalid.txt")
+_4HHB_ASSEMBLY1 = os.path.join(_FILES_DIR, "4hhb-assembly1.cif.gz")
+_4HHB_PDB1 = os.path.join(_FILES_DIR, "4hhb.pdb1")
+_4HHB_PDB1_GZ = os.path.join(_FILES_DIR, "4hhb.pdb1.gz")
+_2MNR_CIF = os.path.join(_FILES_DIR, "2mnr.cif")
+_4HHB_CIF_URL = "https://files.rcsb.org/view/4HHB.cif"
+
+# Structure motif residues (of 2MNR) used by the structure motif and count tests. They are validated on
+# construction, so they are built once
+_RES = SimpleNamespace(
+    a162=StructureMotifResidue("A", "1", 162, ["LYS", "HIS"]),
+    a193=StructureMotifResidue("A", "1", 193),
+    a193Asp=StructureMotifResidue("A", "1", 193, ["ASP"]),
+    a192=StructureMotifResidue("A", "1", 192, ["LYS", "HIS", "ASP", "VAL"]),
+    a191=StructureMotifResidue("A", "1", 191, ["LYS", "HIS", "ASP", "VAL"]),
+    a190=StructureMotifResidue("A", "1", 190, ["LYS", "HIS", "ASP", "VAL"]),
+    a189=StructureMotifResidue("A", "1", 189, ["LYS", "HIS", "ASP", "VAL"]),
+    a219=StructureMotifResidue("A", "1", 219),
+    a245=StructureMotifResidue("A", "1", 245, ["GLU", "ASP", "ASN"]),
+    a295=StructureMotifResidue("A", "1", 295, ["HIS", "LYS"]),
+)
+
+# (label, StructSimilarityQuery arguments) of testStructSimQuery, each of which should find results
+_STRUCT_SIM_CASES = [
+    ("Basic Structure Similarity query", dict(entry_id="4HHB")),
+    ("Query with chain ID", dict(structure_search_type="entry_id", entry_id="4HHB", structure_input_type="chain_id", chain_id="A",
+                                 target_search_space="polymer_entity_instance")),
+    ("Query with file url", dict(structure_search_type="file_url", file_url=_4HHB_CIF_URL, file_format="cif")),
+    ("Query with file upload", dict(structure_search_type="file_upload", file_path=_4HHB_CIF, file_format="cif")),
+    ("Query with relaxed operator", dict(structure_search_type="entry_id", entry_id="4HHB", operator="relaxed_shape_match")),
+    ("Query with polymer entity instance", dict(structure_search_type="entry_id", entry_id="4HHB", structure_input_type="chain_id", chain_id="B",
+                                                operator="relaxed_shape_match", target_search_space="polymer_entity_instance")),
+    ("File upload query using 4HHB Assembly 1 cif zip file",
+     dict(structure_search_type="file_upload", file_path=_4HHB_ASSEMBLY1, file_format="cif")),
+    ("File upload query using 4HHB PDB file", dict(structure_search_type="file_upload", file_path=_4HHB_PDB, file_format="pdb")),
+    ("File upload query using 4HHB bcif file", dict(structure_search_type="file_upload", file_path=_4HHB_BCIF, file_format="bcif")),
+    ("File url query using mmcif file format, relaxed, and chains",
+     dict(structure_search_type="file_url", file_url=_4HHB_CIF_URL, file_format="cif", operator="relaxed_shape_match", target_search_space="polymer_entity_instance")),
+]
+
+_SMILES = "Cc1c(sc[n+]1Cc2cnc(nc2N)C)CCO"
+_INCHI = "InChI=1S/C13H10N2O4/c16-10-6-5-9(11(17)14-10)15-12(18)7-3-1-2-4-8(7)13(15)19/h1-4,9H,5-6H2,(H,14,16,17)/t9-/m0/s1"
+
+# (label, ChemSimilarityQuery arguments) of testChemSimilarityQuery; these should succeed, and whether
+# they find results is only logged
+_CHEM_SIM_CASES = [
+    ("Basic query with default values", dict(value="C12 H17 N4 O S")),
+    ("Query with type = formula and match subset = True", dict(value="C12 H28 O4", query_type="formula", match_subset=True)),
+    ("Query with using type - descriptor, SMILES, and graph-relaxed-stereo",
+     dict(value=_SMILES, query_type="descriptor", descriptor_type="SMILES", match_type="graph-relaxed-stereo")),
+    ("Query with using type - descriptor, SMILES, and graph-relaxed",
+     dict(value=_SMILES, query_type="descriptor", descriptor_type="SMILES", match_type="graph-relaxed")),
+    ("Query with using type - descriptor, SMILES, and fingerprint-similarity",
+     dict(value=_SMILES, query_type="descriptor", descriptor_type="SMILES", match_type="fingerprint-similarity")),
+    ("Query with using type - descriptor, InChI, and sub-struct-graph-relaxed-stereo",
+     dict(value=_INCHI, query_type="descriptor", descriptor_type="InChI", match_type="sub-struct-graph-relaxed-stereo")),
+    ("Query with using type - descriptor, InChI, and sub-struct-graph-relaxed",
+     dict(value=_INCHI, query_type="descriptor", descriptor_type="InChI", match_type="sub-struct-graph-relaxed")),
+    ("Query with using type - descriptor, InChI, and graph-exact",
+     dict(value=_INCHI, query_type="descriptor", descriptor_type="InChI", match_type="graph-exact")),
+]
+
+# (label, query, request options) of testReturnCounts, whose return_counts result must match the total count of the results
+_RETURN_COUNTS_CASES = [
+    ("structural Attribute query", AttributeQuery("exptl.method", "exact_match", "FLUORESCENCE TRANSFER"), dict(return_type="assembly")),
+    ("Text query", TextQuery("hemoglobin"), {}),
+    # CHEMICAL_ATTRIBUTE_SEARCH_SERVICE specifies the "text_chem" service
+    ("chemical Attribute query", AttributeQuery("drugbank_info.brand_names", "contains_phrase", "tylenol", CHEMICAL_ATTRIBUTE_SEARCH_SERVICE), {}),
+    ("Sequence query", SequenceQuery("MTEYKLVVVGAGGVGKSALTIQLIQNHFVDEYDPTIEDSYRKQVVIDGET"
+                                     + "CLLDILDTAGQEEYSAMRDQYMRTGEGFLCVFAINNTKSFEDIHQYREQI"
+                                     + "KRVKDSDDVPMVLVGNKCDLPARTVETRQAQDLARSYGIPYIETSAKTRQ"
+                                     + "GVEDAFYTLVREIRQHKLRKLNPPDESGPGCMNCKCVIS", 1, 0.9), {}),
+    ("Sequence motif query", SeqMotifQuery("C-x(2,4)-C-x(3)-[LIVMFYWC]-x(8)-H-x(3,5)-H.", pattern_type="prosite", sequence_type="protein"), {}),
+    ("Structure similarity query", StructSimilarityQuery(structure_search_type="entry_id", entry_id="4HHB", structure_input_type="assembly_id", assembly_id="1",
+                                                         operator="strict_shape_match", target_search_space="assembly"), {}),
+    ("Chemical similarity query", ChemSimilarityQuery(value="C12 H17 N4 O S"), {}),
+    ("Structure motif query", StructMotifQuery(entry_id="2MNR", residue_ids=[_RES.a162, _RES.a193, _RES.a219, _RES.a245, _RES.a295]), {}),
+]
+
+
+def _tail(url):
+    """Last path component of a URL, e.g. the file name of an uploaded structure"""
+    return url.rsplit("/", 1)[-1]
+
+
+def _exampleQuery1():
+    """The 'Biological Assembly Search' example of http://search.rcsb.org/#examples in operator syntax"""
+    q1 = TextQuery("heat-shock transcription factor")
+    q2 = _SYM_SYMBOL == "C2"
+    q3 = _SYM_KIND == "Global Symmetry"
+    q4 = _DNA_COUNT >= 1
+
+    # combined using bitwise operators (&, |, ~, etc)
+    return q1 & (q2 & q3 & q4)  # AND of all queries
+
+
+def _contains(results, target):
+    """Whether target is among the results, and how many results were read to tell. Stops reading
+    at the target, so further pages of results are only requested while it hasn't been found."""
+    seen = 0
+    for result in results:
+        seen += 1
+        if result == target:
+            return True, seen
+    return False, seen
+
+
+def _runConcurrently(func, items):
+    """Results of func for each of the items, in order. The calls run on a thread pool, as
+    queries mostly wait on the search API; an exception raised by a call is raised again here."""
+    with ThreadPoolExecutor(max_workers=min(len(items), 8)) as executor:
+        return list(executor.map(func, items))
+
+
+def _runCapture(func):
+    """Call func, and return its result and None, or None and the exception it raised. Lets
+    concurrently run calls report failures later, e.g. within the subtest they belong to."""
+    try:
+        return func(), None
+    except Exception as error:  # pylint: disable=broad-except
+        return None, error
+
+
+@functools.lru_cache(maxsize=64)
+def _entry_in(*ids):
+    """Query for the given entry identifiers. Queries are immutable, so the same query
+    object is returned for the same identifiers."""
+    return AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=list(ids))
+
+
+@contextlib.contextmanager
+def _stubSearch(statusCode, *pages, cache=False):
+    """Answer search requests with responses of the given status code instead of sending them
+    to the search API, for cases with a known outcome. The responses have the given pages as
+    content, one per request in turn, or are empty. Yields the mocked request method. The search
+    cache is bypassed, or with cache replaced by an empty one, so canned responses aren't kept."""
+    def response(content):
+        stubbed = requests.Response()
+        stubbed.status_code = statusCode
+        stubbed.raw = io.BytesIO(content)
+        return stubbed
+
+    with contextlib.ExitStack() as stack:
+        if pages:
+            get = stack.enter_context(mock.patch.object(search.HTTP_SESSION, "get", side_effect=[response(page) for page in pages]))
+        else:
+            get = stack.enter_context(mock.patch.object(search.HTTP_SESSION, "get", return_value=response(b"")))
+        stack.enter_context(mock.patch.dict(os.environ, {SEARCH_CACHE_ENV: "1" if cache else "0"}))
+        if cache:
+            emptyCache = functools.lru_cache(maxsize=None)(search._cached_search_request.__wrapped__)  # pylint: disable=protected-access
+            stack.enter_context(mock.patch.object(search, "_cached_search_request", emptyCache))
+        yield get
+
+
+def _sentQuery(get):
+    """Query of the last search request sent to the mocked request method yielded by _stubSearch"""
+    return json.loads(get.call_args[0][1]["json"])["query"]
+
+
+def _httpCacheKey(request, **kwargs):
+    """requests-cache key of a request. The request_info of search requests is left out, as its
+    query_id differs for every session, so that identical queries are answered from the cache."""
+    parts = urllib.parse.urlsplit(request.url)
+    params = urllib.parse.parse_qs(parts.query, keep_blank_values=True)
+    if "json" in params:
+        body = json.loads(params["json"][0])
+        body.pop("request_info", None)
+        params["json"] = [json.dumps(body, sort_keys=True, separators=(",", ":"))]
+        request = request.copy()
+        request.url = parts._replace(query=urllib.parse.urlencode(params, doseq=True)).geturl()
+    return requests_cache.create_key(request, **kwargs)
+
+
+def _httpCacheSession(session, cacheName, **kwargs):
+    """requests-cache session keeping the responses to GET requests (uploads aren't cached), with the
+    same headers, connection pool and retry policy as session. Extra arguments go to CachedSession."""
+    cachedSession = requests_cache.CachedSession(cacheName, key_fn=_httpCacheKey, allowable_methods=("GET", "HEAD"), **kwargs)
+    cachedSession.headers.update(session.headers)
+    for prefix, adapter in session.adapters.items():
+        cachedSession.mount(prefix, adapter)
+    return cachedSession
+
+
+class _CannedAdapter(HTTPAdapter):
+    """Transport adapter answering every request with the same JSON page, and counting the requests it was sent"""
+
+    def __init__(self, page):
+        super().__init__()
+        self.page = page
+        self.sent = 0
+
+    def send(self, request, *args, **kwargs):  # pylint: disable=arguments-differ,unused-argument
+        self.sent += 1
+        raw = urllib3.HTTPResponse(body=io.BytesIO(self.page), status=200, headers={"Content-Type": "application/json"}, preload_content=False)
+        return self.build_response(request, raw)
+
 
 class SearchTests(unittest.TestCase):
+    __rusageUnit = "MB" if platform.system() == "Darwin" else "GB"
+    __logMem = os.environ.get("RCSB_LOG_MEM") == "1"  # also report the max resident memory after each test
+    __timings = []  # (test id, elapsed nanoseconds, max resident memory) of each completed test
+    # Identifier lookup shared by several tests; with the search cache enabled it reaches the search API once
+    __idsQuery = _entry_in("4HHB", "2GS2")
+
+    @classmethod
+    def setUpClass(cls):
+        # Everything set up here is undone by class cleanups, registered as soon as it is set up, so that it is
+        # also undone if setUpClass fails part way through.
+        # Log through a single stream handler while the tests run. Importing the package may already have
+        # added a default one to the root logger (logging.info configures it); set that aside until the tests are done
+        for handler in [handler for handler in logger.handlers if type(handler) is logging.StreamHandler]:  # pylint: disable=unidiomatic-typecheck
+            logger.removeHandler(handler)
+            cls.addClassCleanup(logger.addHandler, handler)
+        logHandler = logging.StreamHandler()
+        logHandler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s]-%(module)s.%(funcName)s: %(message)s"))
+        logger.addHandler(logHandler)
+        cls.addClassCleanup(logger.removeHandler, logHandler)
+        # Tests repeat several identical queries; let those reach the search API only once
+        searchCachePatch = mock.patch.dict(os.environ, {SEARCH_CACHE_ENV: "1"})
+        searchCachePatch.start()
+        cls.addClassCleanup(searchCachePatch.stop)
+        # Query and structure motif shared by several requests, built once so their requests are identical
+        cls._METHODOLOGY_Q = AttributeQuery(
+            attribute="rcsb_entry_info.structure_determination_methodology",
+            operator="exact_match",
+            value="experimental",
+        )
+        # Query and grouping shared by the group-by and facet tests
+        cls._Q_PEC_EQ_1 = AttributeQuery(attribute="rcsb_assembly_info.polymer_entity_count", operator="equals", value=1)
+        cls._GB_SEQID_95 = GroupBy(aggregation_method="sequence_identity", similarity_cutoff=95)
+        # Group membership filters shared by the facet, group-by and sort tests
+        cls._TF_SEQID = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.aggregation_method", operator="exact_match", value="sequence_identity")
+        cls._TF_EM = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.aggregation_method", operator="exact_match", value="electron microscopy")
+        cls._TF_SIM100 = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.similarity_cutoff", operator="equals", value=100)
+        cls._GF_EM_AND_SIM100 = GroupFilter(logical_operator="and", nodes=[cls._TF_EM, cls._TF_SIM100])
+        # Send the requests of the tests through a session of their own, with the same connection pool and
+        # retry policy as the library's HTTP_SESSION, so it can be closed once the tests are done (which
+        # releases the pooled connections shared by all their queries and uploads)
+        httpSession = search._make_http_session()  # pylint: disable=protected-access
+        cls.addClassCleanup(httpSession.close)
+        httpSessionPatch = mock.patch.object(search, "HTTP_SESSION", httpSession)
+        httpSessionPatch.start()
+        cls.addClassCleanup(httpSessionPatch.stop)
+        # Optionally keep search responses on disk between runs: for an hour (RCSB_TEST_CACHE=1, e.g. for repeated
+        # local runs), or until the cache file is deleted (RCSB_TEST_CACHE=replay: the first run records the responses,
+        # later runs replay them and record any new requests). Off by default, so that the tests check the live search API
+        testCache = os.environ.get("RCSB_TEST_CACHE")
+        if testCache in ("1", "replay"):
+            if requests_cache is None:
+                logger.warning("RCSB_TEST_CACHE is set but requests-cache is not installed; responses are not cached")
+            else:
+                cachedSession = _httpCacheSession(
+                    search.HTTP_SESSION,
+                    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".rcsb_http_cache"),
+                    backend="sqlite",
+                    expire_after=requests_cache.NEVER_EXPIRE if testCache == "replay" else 3600,
+                )
+                httpCachePatch = mock.patch.object(search, "HTTP_SESSION", cachedSession)
+                httpCachePatch.start()
+                cls.addClassCleanup(httpCachePatch.stop)
+        # Open a pooled connection to the search API up front, so the first test doesn't pay for the handshake
+        try:
+            search.HTTP_SESSION.head(RCSB_SEARCH_API_QUERY_URL, timeout=10)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Could not connect to the search API: %s", e)
+
+    @classmethod
+    def tearDownClass(cls):
+        if logger.isEnabledFor(logging.INFO):  # skip sorting and scaling the timings if they aren't reported
+            if cls.__logMem:
+                logger.info("%-70s %12s %12s", "Test", "Seconds", "Max RSS (%s)" % cls.__rusageUnit)
+            else:
+                logger.info("%-70s %12s", "Test", "Seconds")
+            for testId, elapsedNs, rusageMax in sorted(cls.__timings, key=lambda t: t[1], reverse=True):
+                if cls.__logMem:
+                    logger.info("%-70s %12.4f %12.4f", testId, elapsedNs / 10 ** 9, rusageMax / 10 ** 6)
+                else:
+                    logger.info("%-70s %12.4f", testId, elapsedNs / 10 ** 9)
+
     def setUp(self):
-        self.__startTime = time.time()
-        logger.info("Starting %s at %s", self.id(), time.strftime("%Y %m %d %H:%M:%S", time.localtime()))
-        HERE = os.path.abspath(os.path.dirname(__file__))
-        self.__dirPath = os.path.join(HERE, "files")
-        self.__4hhbBcif = os.path.join(self.__dirPath, "4hhb.bcif")
-        self.__4hhbCif = os.path.join(self.__dirPath, "4hhb.cif")
-        self.__4hhbPdb = os.path.join(self.__dirPath, "4hhb.pdb")
-        self.__7n0rPdbGz = os.path.join(self.__dirPath, "7n0r.pdb.gz")
-        self.__7n0rCifGz = os.path.join(self.__dirPath, "7n0r.cif.gz")
-        self.__invalidTxt = os.path.join(self.__dirPath, "invalid.txt")
-        self.__4hhbAssembly1 = os.path.join(self.__dirPath, "4hhb-assembly1.cif.gz")
-        self.__4hhbpdb1 = os.path.join(self.__dirPath, "4hhb.pdb1")
-        self.__4hhbpdb1Gz = os.path.join(self.__dirPath, "4hhb.pdb1.gz")
-        self.__2mnr = os.path.join(self.__dirPath, "2mnr.cif")
+        self.__startNs = time.perf_counter_ns()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Starting %s at %s", self.id(), time.strftime("%Y %m %d %H:%M:%S", time.localtime()))
 
     def tearDown(self):
-        unitS = "MB" if platform.system() == "Darwin" else "GB"
-        rusageMax = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
-        logger.info("Maximum resident memory size %.4f %s", rusageMax / 10 ** 6, unitS)
-        endTime = time.time()
-        logger.info("Completed %s at %s (%.4f seconds)", self.id(), time.strftime("%Y %m %d %H:%M:%S", time.localtime()), endTime - self.__startTime)
+        elapsedNs = time.perf_counter_ns() - self.__startNs
+        rusageMax = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if self.__logMem else None
+        self.__timings.append((self.id(), elapsedNs, rusageMax))
+
+    def _runQueries(self, calls):
+        """Run independent calls (by name) concurrently, e.g. the queries of several subtests. Returns a
+        function giving the result of a named call, which fails the calling (sub)test if the call raised."""
+        outcomes = dict(zip(calls, _runConcurrently(_runCapture, list(calls.values()))))
+
+        def result(name):
+            value, error = outcomes[name]
+            if error is not None:
+                self.fail(f"Failed unexpectedly: {error}")
+            return value
+
+        return result
 
     def testConstruction(self):
         """Test the construction of queries, and check that the query is what
@@ -71,40 +389,103 @@ class SearchTests(unittest.TestCase):
         q2 = AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=["4HHB", "5T89"])
 
         both = q1 & q2
-        ok = isinstance(both, Group)
-        self.assertTrue(ok)
-        ok = both.operator == "and"
-        self.assertTrue(ok)
-        ok = both.nodes[0] == q1
-        self.assertTrue(ok)
-        ok = both.nodes[1] == q2
+        self.assertIsInstance(both, Group)
+        self.assertEqual(both.operator, "and")
+        self.assertEqual(both.nodes[0], q1)
+        self.assertEqual(both.nodes[1], q2)
 
         either = q1 | q2
-        ok = isinstance(either, Group)
-        self.assertTrue(ok)
-        ok = either.operator == "or"
-        self.assertTrue(ok)
-        ok = either.nodes[0] == q1
-        self.assertTrue(ok)
-        ok = either.nodes[1] == q2
-        self.assertTrue(ok)
-        logger.info("Construction test results: ok : (%r)", ok)
+        self.assertIsInstance(either, Group)
+        self.assertEqual(either.operator, "or")
+        self.assertEqual(either.nodes[0], q1)
+        self.assertEqual(either.nodes[1], q2)
+
+        # Check the JSON body that would be sent to the API
+        q1Dict = {
+            "type": "terminal",
+            "service": "text",
+            "parameters": {"attribute": "rcsb_entry_container_identifiers.entry_id", "operator": "in", "negation": False, "value": ["4HHB", "2GS2"]},
+            "node_id": 0,
+        }
+        self.assertEqual(q1.to_dict(), q1Dict)
+        self.assertEqual(q1.body, q1Dict)
+        self.assertIs(q1.body, q1.body)  # computed once per query
+        self.assertEqual(len(both.to_dict()["nodes"]), 2)
+        self.assertEqual(both.to_dict(), {"type": "group", "logical_operator": "and", "nodes": [q1Dict, q2.to_dict()]})
+        self.assertEqual(either.to_dict()["logical_operator"], "or")
+        logger.info("Construction test results: ok")
+
+    def testHttpRetryPolicy(self):
+        """Test the retry policy of the shared HTTP session, which handles server throttling (429s)
+        and transient gateway errors in place of a fixed delay between requests."""
+        retry = search.HTTP_SESSION.get_adapter(RCSB_SEARCH_API_QUERY_URL).max_retries
+        self.assertEqual(retry.total, HTTP_RETRY_TOTAL)
+        self.assertEqual(retry.backoff_factor, HTTP_RETRY_BACKOFF_FACTOR)
+        self.assertEqual(set(retry.status_forcelist), set(HTTP_RETRY_STATUS_CODES))
+        self.assertEqual(set(retry.allowed_methods), {"GET", "POST"})
+        self.assertTrue(retry.respect_retry_after_header)
+        self.assertFalse(retry.raise_on_status)
+        logger.info("HTTP retry policy test results: ok")
+
+    @unittest.skipIf(requests_cache is None, "requires requests-cache")
+    def testHttpCacheReplay(self):
+        """Test that the on-disk response cache of RCSB_TEST_CACHE answers a query sent again by
+        another session, although the query_id of its request differs."""
+        cachedSession = _httpCacheSession(search.HTTP_SESSION, "testHttpCacheReplay", backend="memory")
+        adapter = _CannedAdapter(b'{"query_id":"x","result_type":"entry","total_count":1,"result_set":["4HHB"]}')
+        cachedSession.mount("https://", adapter)
+        responses = [cachedSession.get(RCSB_SEARCH_API_QUERY_URL, {"json": search._json_dumps(Session(self.__idsQuery)._make_params())})  # pylint: disable=protected-access
+                     for _ in range(2)]
+        self.assertFalse(responses[0].from_cache)
+        self.assertTrue(responses[1].from_cache)
+        # Executing the query again, bypassing the in-memory search cache, is answered from the cache too
+        with mock.patch.object(search, "HTTP_SESSION", cachedSession), mock.patch.dict(os.environ, {SEARCH_CACHE_ENV: "0"}):
+            self.assertEqual(list(self.__idsQuery()), ["4HHB"])
+        self.assertEqual(adapter.sent, 1)
+        logger.info("HTTP cache replay test results: ok")
 
     def testSingleQuery(self):
         """Test firing off a single query, making sure the result is not None."""
-        q1 = AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=["4HHB", "2GS2"])
-        session = Session(Group("and", [q1]))
+        session = Session(Group("and", [self.__idsQuery]))  # a group with a single node
         result = session._single_query()  # pylint takes issue with this as this is a protected method
-        print(result)
+        logger.debug("Single query response: %s", result)
         ok = result is not None
         self.assertTrue(ok)
         logger.info("Single query test results: ok : (%r)", ok)
 
+    def testCachedDateQuery(self):
+        """Test that a query comparing to a date can be sent with the search cache enabled,
+        and that repeating it is answered by the cache."""
+        q1 = attrs.rcsb_accession_info.initial_release_date > date(2019, 8, 20)
+        page = b'{"query_id":"x","result_type":"entry","total_count":1,"result_set":["6KZ5"]}'
+        with _stubSearch(200, page, cache=True) as get:
+            result = [list(Session(q1)) for _ in range(2)]
+        self.assertEqual(result, [["6KZ5"], ["6KZ5"]])
+        self.assertEqual(get.call_count, 1)
+        self.assertIn('"value":"2019-08-20"', get.call_args[0][1]["json"])
+        self.assertEqual(json.loads(q1.to_json()), _sentQuery(get))
+        logger.info("Cached date query test results: ok")
+
+    def testFirstPageReuse(self):
+        """Test that each page of the results of an executed query is requested once, as
+        iterating reuses the first page fetched by exec, and that to_dict returns its own copy."""
+        page1 = b'{"query_id":"x","result_type":"entry","total_count":3,"result_set":["4HHB","2GS2"]}'
+        page2 = b'{"query_id":"x","result_type":"entry","total_count":3,"result_set":["5T89"]}'
+        with _stubSearch(200, page1, page1, page2) as get:
+            session = _entry_in("4HHB", "2GS2", "5T89")(rows=2)
+            self.assertEqual(get.call_count, 1)
+            self.assertEqual(session.count, 3)
+            session.to_dict()["result_set"].clear()
+            self.assertEqual(get.call_count, 2)
+            result = list(session)
+        self.assertEqual(result, ["4HHB", "2GS2", "5T89"])
+        self.assertEqual(get.call_count, 3)
+        logger.info("First page reuse test results: ok")
+
     def testIquery(self):
         """Tests the iquery function, which evaluates a query with a progress bar.
         The progress bar requires tqdm to run. """
-        q1 = AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=["4HHB", "2GS2"])
-        session = Session(q1)
+        session = Session(self.__idsQuery)
         result = session.iquery()
         ok = len(result) == 2
         self.assertTrue(ok)
@@ -113,8 +494,7 @@ class SearchTests(unittest.TestCase):
     def testIterable(self):
         """Take a query, make it iterable and then test that its attributes remain unchanged as a result. """
         ids = ["4HHB", "2GS2"]
-        q1 = AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=ids)
-        result = set(q1())
+        result = set(self.__idsQuery())
         ok = len(result) == 2
         ok2 = result == set(ids)
         self.assertTrue(ok)
@@ -134,7 +514,7 @@ class SearchTests(unittest.TestCase):
         self.assertTrue(ok)
         logger.info("Inversion test results: ok : (%r)", ok)
         # Test that seqqueries fail as intended:
-        q4 = SequenceQuery("VLSPADKTNVKAAWGKVGAHAGEYGAEALERMFLSFPTTKTYFPHFDLSHGSAQVKGHGKKVADALTNAVAHVDDMPNALSALSDLHAHKLRVDPVNFKLLSHCLLVTLAAHLPAEFTPAVHASLDKFLASVSTVLTSKYR")
+        q4 = SequenceQuery(_HBB_ALPHA)
         ok = False
         try:
             _ = ~q4
@@ -147,8 +527,8 @@ class SearchTests(unittest.TestCase):
         """Test the overloaded XOR operator in a query. """
         ids1 = ["5T89", "2GS2"]
         ids2 = ["4HHB", "2GS2"]
-        q1 = AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=ids1)
-        q2 = AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=ids2)
+        q1 = _entry_in(*ids1)
+        q2 = _entry_in(*ids2)
         q3 = q1 ^ q2  # overloaded xor operator used on results
         result = set(q3())
         ok = len(result) == 2
@@ -157,8 +537,8 @@ class SearchTests(unittest.TestCase):
         self.assertTrue(ok)
         logger.info("Xor test results: ok : (%r)", ok)
         # Test that xor fails when used for seqqueries
-        q4 = SequenceQuery("VLSPADKTNVKAAWGKVGAHAGEYGAEALERMFLSFPTTKTYFPHFDLSHGSAQVKGHGKKVADALTNAVAHVDDMPNALSALSDLHAHKLRVDPVNFKLLSHCLLVTLAAHLPAEFTPAVHASLDKFLASVSTVLTSKYR")
-        q5 = SequenceQuery("VLSPADKTNVKAAWGKVGAHAGEYGAEALERMFLSFPTTKTYFPHFDLSHGSAQVKGHGKKVADALTNAVAHVDDMPNALSALSDLHAHKLRVDPVNFKLLSHCLLVTLAAHLPAEFTPAVHASLDKFLASVSTVLTSKYR")
+        q4 = SequenceQuery(_HBB_ALPHA)
+        q5 = SequenceQuery(_HBB_ALPHA)
         ok = False
         try:
             _ = q4 ^ q5  # this should fail as xor is not supported behavior for seq queries
@@ -169,32 +549,38 @@ class SearchTests(unittest.TestCase):
 
     def testPagination(self):
         """Test the pagination of the query. Note that this test differs from
-        the large pagination tests below, which test avoiding a 429 error,
+        testLargeCount below, which walks pages of a query with many results,
         while this exists to make sure the feature behaves as intended. """
+        def collect(session, limit):
+            """Identifiers returned by the session and their number, stopping once more than limit were returned"""
+            seen, count = set(), 0
+            for identifier in session:
+                seen.add(identifier)
+                count += 1
+                if count > limit:
+                    break
+            return seen, count
+
         ids = ["4HHB", "2GS2", "5T89", "1TIM"]
-        q1 = AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=ids)
+        q1 = _entry_in(*ids)
 
         # 2+2 results
-        session = Session(q1, rows=2)
-        result = set(session)
-        ok = len(result) == 4
+        result, count = collect(Session(q1, rows=2), len(ids))
+        ok = count == 4
         self.assertTrue(ok)
         ok = result == set(ids)
         self.assertTrue(ok)
 
         # 3+1 results
-        session = Session(q1, rows=3)
-        result = set(session)
-        ok = len(result) == 4
+        result, count = collect(Session(q1, rows=3), len(ids))
+        ok = count == 4
         self.assertTrue(ok)
         ok = result == set(ids)
         self.assertTrue(ok)
 
         # 1ABC will never be a valid ID
-        q2 = AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=["1ABC"])
-        session = Session(q2)
-        result = set(session)
-        ok = len(result) == 0
+        q2 = _entry_in("1ABC")
+        ok = next(iter(Session(q2)), None) is None
         self.assertTrue(ok)
         logger.info("Pagination test results: ok : (%r)", ok)
 
@@ -204,49 +590,42 @@ class SearchTests(unittest.TestCase):
         if the query somehow completes successfully. """
         q1 = AttributeQuery("invalid_identifier", operator="exact_match", value="ERROR", service="text")
         session = Session(q1)
-        try:
-            set(session)
-            ok = False
-        except requests.HTTPError:
-            ok = True
-        self.assertTrue(ok)
+        with _stubSearch(400) as get:  # the search API rejects unknown attributes
+            try:
+                set(session)
+                ok = False
+            except requests.HTTPError:
+                ok = True
+        self.assertTrue(ok)
+        self.assertTrue(get.called)
+        sent = _sentQuery(get)  # the malformed query is sent as is, and rejected by the search API
+        self.assertEqual(sent, q1.to_dict())
+        self.assertEqual(sent["service"], "text")
+        self.assertEqual(sent["parameters"]["attribute"], "invalid_identifier")
         logger.info("Malformed query test results: ok : (%r)", ok)
 
-    def exampleQuery1(self):
+    def testExampleQuery1(self):
         """Make an example query, and make sure it performs correctly.
         This example is pulled directly from the 'Biological Assembly Search'
         example found at http://search.rcsb.org/#examples"""
-        q1 = TextQuery("heat-shock transcription factor")
-        q2 = attrs.rcsb_struct_symmetry.symbol == "C2"
-        q3 = attrs.rcsb_struct_symmetry.kind == "Global Symmetry"
-        q4 = attrs.rcsb_entry_info.polymer_entity_count_DNA >= 1
-
-        # combined using bitwise operators (&, |, ~, etc)
-        query = q1 & (q2 & q3 & q4)  # AND of all queries
-
-        results = set(query("assembly"))
-        ok = len(results) > 0  # 1657 results 2023-06
-        self.assertTrue(ok)
-        ok = "1FYL-1" in results
+        query = _exampleQuery1()
+        ok, seen = _contains(query("assembly"), "1FYL-1")  # 1657 results 2023-06
         self.assertTrue(ok)
+        logger.info("Example1 Test Results: read: (%d) ok: (%r)", seen, ok)
 
-        # Fluent syntax
+    def testExampleQuery1Fluent(self):
+        """Build the first example query in fluent syntax, and make sure it is the same query"""
         query2 = TextQuery("heat-shock transcription factor").and_(AttributeQuery(attribute="rcsb_struct_symmetry.symbol", operator="exact_match", value="C2")
                                                                    .and_("rcsb_struct_symmetry.kind", STRUCTURE_ATTRIBUTE_SEARCH_SERVICE)
                                                                    .exact_match("Global Symmetry")
                                                                    .and_("rcsb_entry_info.polymer_entity_count_DNA", STRUCTURE_ATTRIBUTE_SEARCH_SERVICE)
                                                                    .greater_or_equal(1))
-        ok = query2 == query
-        self.assertTrue(ok)
+        # Equal queries send identical requests, so the results of testExampleQuery1 apply here too
+        self.assertEqual(query2, _exampleQuery1())
+        self.assertEqual(query2.to_dict(), _exampleQuery1().to_dict())
+        logger.info("Example1 fluent syntax Test Results: ok")
 
-        results = set(query2.exec("assembly"))
-        ok = len(results) > 0  # 1657 results 2023-06
-        self.assertTrue(ok)
-        ok = "1FYL-1" in results
-        self.assertTrue(ok)
-        logger.info("Example1 Test Results: length: (%d) ok: (%r)", len(results), ok)
-
-    def exampleQuery2(self):
+    def testExampleQuery2(self):
         """Make another example query, and make sure that it performs successfully. """
         q1 = (
             TextQuery("thymidine kinase")
@@ -267,205 +646,207 @@ class SearchTests(unittest.TestCase):
             )
             & AttributeQuery("rcsb_entry_info.nonpolymer_entity_count", operator="greater", value=0)
         )
-        results = set(q1("entry"))
-        ok = len(results) > 0  # 1484 results 2023-06
-        self.assertTrue(ok)
-        ok = "1KI6" in results  # make sure that the right information is pulled
+        ok, seen = _contains(q1("entry"), "1KI6")  # make sure that the right information is pulled; 1484 results 2023-06
         self.assertTrue(ok)
-        logger.info("Example2 Test Results: length: (%d) ok: (%r)", len(results), ok)
+        logger.info("Example2 Test Results: read: (%d) ok: (%r)", seen, ok)
 
     def testAttribute(self):
         """Test the attributes - make sure that they are assigned correctly, etc. """
         attr = Attr(attribute="attr", type="type")
 
         term = attr == "value"
-        ok = isinstance(term, Terminal)
-        self.assertTrue(ok)
-        ok = term.params.get("operator") == "exact_match"
-        self.assertTrue(ok)
+        self.assertIsInstance(term, Terminal)
+        self.assertEqual(term.params.get("operator"), "exact_match")
 
         term = "value" == attr
-        ok = isinstance(term, Terminal)
-        self.assertTrue(ok)
-        ok = term.params.get("operator") == "exact_match"
-        self.assertTrue(ok)
+        self.assertIsInstance(term, Terminal)
+        self.assertEqual(term.params.get("operator"), "exact_match")
 
         term = Value("value") == attr
-        ok = isinstance(term, Terminal)
-        self.assertTrue(ok)
-        ok = term.params.get("operator") == "exact_match"
-        self.assertTrue(ok)
-        logger.info("Attribute tests results: ok: (%d)", ok)
+        self.assertIsInstance(term, Terminal)
+        self.assertEqual(term.params.get("operator"), "exact_match")
+        self.assertEqual(
+            term.to_dict(),
+            {"type": "terminal", "service": "type", "parameters": {"attribute": "attr", "operator": "exact_match", "negation": False, "value": "value"}, "node_id": 0},
+        )
+        logger.info("Attribute tests results: ok")
 
     def testFreeText(self):
         """Test the free text search function"""
         query = TextQuery("tubulin")  # make a TextQuery
-        results = list(query())  # make it an iterable set
-        ok = len(results) > 0  # assert the result isn't blank
+        resultCount = query(return_counts=True)
+        ok = resultCount > 0  # assert the result isn't blank
         self.assertTrue(ok)
-        logger.info("FreeText test results: length (%d) ok (%r)", len(results), ok)
+        logger.info("FreeText test results: length (%d) ok (%r)", resultCount, ok)
 
     def testPartialQuery(self):
         """Test the ability to perform partial queries. """
+        def terminals(nodes):
+            return [(node.params.get("attribute"), node.params.get("operator"), node.params.get("value")) for node in nodes]
+
         query = Attr(attribute="a", type="text").equals("aval").and_("b")
 
-        ok = isinstance(query, PartialQuery)
-        self.assertTrue(ok)
+        self.assertIsInstance(query, PartialQuery)
 
         query = query.exact_match("bval")
 
-        ok = isinstance(query, Group)
-        self.assertTrue(ok)
-        ok = query.operator == "and"
-        self.assertTrue(ok)
-        ok = len(query.nodes) == 2
-        self.assertTrue(ok)
-        ok = query.nodes[0].params.get("attribute") == "a"
-        self.assertTrue(ok)
-        ok = query.nodes[0].params.get("operator") == "equals"
-        self.assertTrue(ok)
-        ok = query.nodes[0].params.get("value") == "aval"
-        self.assertTrue(ok)
-        ok = query.nodes[1].params.get("attribute") == "b"
-        self.assertTrue(ok)
-        ok = query.nodes[1].params.get("operator") == "exact_match"
-        self.assertTrue(ok)
-        ok = query.nodes[1].params.get("value") == "bval"
+        self.assertIsInstance(query, Group)
+        self.assertEqual(query.operator, "and")
+        self.assertEqual(terminals(query.nodes), _PARTIAL_QUERY_TERMINALS[:2])
 
         query = query.and_(Attr("c", "text") < 5)
-        ok = len(query.nodes) == 3
-        self.assertTrue(ok)
-        ok = query.nodes[2].params.get("attribute") == "c"
-        self.assertTrue(ok)
-        ok = query.nodes[2].params.get("operator") == "less"
-        self.assertTrue(ok)
-        ok = query.nodes[2].params.get("value") == 5
-        self.assertTrue(ok)
+        self.assertEqual(terminals(query.nodes), _PARTIAL_QUERY_TERMINALS)
 
         query = query.or_("d")
 
-        ok = isinstance(query, PartialQuery)
-        self.assertTrue(ok)
-        ok = query.attr == Attr("d", "text")
-        self.assertTrue(ok)
-        ok = query.operator == "or"
-        self.assertTrue(ok)
+        self.assertIsInstance(query, PartialQuery)
+        self.assertEqual(query.attr, Attr("d", "text"))
+        self.assertEqual(query.operator, "or")
 
         query = query == "dval"
-        ok = isinstance(query, Group)
-        self.assertTrue(ok)
-        ok = query.operator == "or"
-        self.assertTrue(ok)
-        ok = len(query.nodes) == 2
-        self.assertTrue(ok)
-
-        ok = isinstance(query.nodes[0], Group)
-        self.assertTrue(ok)
-        ok = query.nodes[1].params.get("attribute") == "d"
-        self.assertTrue(ok)
-        ok = query.nodes[1].params.get("operator") == "exact_match"
-        self.assertTrue(ok)
-        ok = query.nodes[1].params.get("value") == "dval"
-        self.assertTrue(ok)
-        logger.info("Partial Query results: ok: (%r)", ok)
+        self.assertIsInstance(query, Group)
+        self.assertEqual(query.operator, "or")
+        self.assertIsInstance(query.nodes[0], Group)
+        self.assertEqual(terminals(query.nodes[0].nodes), _PARTIAL_QUERY_TERMINALS)
+        self.assertEqual(terminals(query.nodes[1:]), [("d", "exact_match", "dval")])
+
+        queryDict = query.to_dict()
+        self.assertEqual(queryDict["logical_operator"], "or")
+        self.assertEqual([node["type"] for node in queryDict["nodes"]], ["group", "terminal"])
+        self.assertEqual(len(queryDict["nodes"][0]["nodes"]), 3)
+        logger.info("Partial Query results: ok")
 
     def testOperators(self):
         """Test operators such as contain and in. """
-        q1 = attrs.rcsb_entry_container_identifiers.rcsb_id.in_(["4HHB", "2GS2"])  # test in
-        results = list(q1())
+        def firstAndContains(query, target):
+            results = iter(query())
+            return next(results, None), _contains(results, target)[0]
+
+        # The operator queries are independent; run them concurrently, then check them in order
+        result = self._runQueries({
+            "in": lambda: list(_RCSB_ID.in_(["4HHB", "2GS2"])()),  # test in
+            "contains words": lambda: firstAndContains(_AUTHORS.contains_words("kisko bliven"), "3V6B"),  # test contains_Words
+            "contains phrase": lambda: next(iter(_AUTHORS.contains_phrase("kisko bliven")()), None),  # test contains_phrase
+            "title": lambda: _contains(_TITLE.contains_phrase("VEGF-A in complex with VEGFR-1 domains D1-6")(), "5T89")[0],
+            # only the number of results matters, which a return_counts request gives without any identifiers
+            "Asymmetric": lambda: _SYM_TYPE.exact_match("Asymmetric")(return_counts=True),
+            "symmetric": lambda: _SYM_TYPE.exact_match("symmetric")(return_counts=True),
+        })
+
+        results = result("in")
         ok = len(results) == 2
         logger.info("In search results length: (%d) ok: (%r)", len(results), ok)
         self.assertTrue(ok)
 
-        q1 = attrs.citation.rcsb_authors.contains_words("kisko bliven")  # test contains_Words
-        results = list(q1())
-        ok = results[0] == "5T89"  # first hit has both authors
+        first, ok2 = result("contains words")
+        ok = first == "5T89"  # first hit has both authors
         self.assertTrue(ok)
-        ok = "3V6B" in results  # only a single author
-        logger.info("Author contains words search results: (%s) ok: (%r)", "3V6B", ok)
+        # ok2: "3V6B" has only a single author
+        logger.info("Author contains words search results: (%s) ok: (%r)", "3V6B", ok2)
 
-        q1 = attrs.citation.rcsb_authors.contains_phrase("kisko bliven")  # test contains_phrase
-        results = list(q1())
-        ok = len(results) == 0
+        first = result("contains phrase")
+        ok = first is None
         self.assertTrue(ok)
-        logger.info("Author contains phrase results: phrase: (%s) length: (%d) ok: (%r)", "kikso bliven", len(results), ok)
+        logger.info("Author contains phrase results: phrase: (%s) first: (%r) ok: (%r)", "kikso bliven", first, ok)
 
-        q1 = attrs.struct.title.contains_phrase(
-            "VEGF-A in complex with VEGFR-1 domains D1-6"
-        )
-        results = list(q1())
-        ok = "5T89" in results
+        ok = result("title")
         self.assertTrue(ok)
         logger.info("Structure title contains phrase: (%s), (%s) in results, ok: (%r)", "VEGF-A in complex with VEGFR-1 domains D1-6", "5T89", ok)
 
-        q1 = attrs.rcsb_struct_symmetry.type.exact_match("Asymmetric")
-        results = list(islice(q1(), 5))
-        ok = len(results) == 5
-        self.assertTrue(ok)
-        logger.info("Structure type exact match: symmetry type: (%s), length: (%d), ok: (%r)", "Asymmetric", len(results), ok)
-
-        q1 = attrs.rcsb_struct_symmetry.type.exact_match("symmetric")
-        results = list(islice(q1(), 5))
-        ok = len(results) == 0
-        self.assertTrue(ok)
-        logger.info("Structure type exact match: symmetry type: (%s), length: (%d), ok: (%r)", "symmetric", len(results), ok)
-
-    def testLargePagination(self):
-        """Test server throttling (avoidance of 429s) - using generic text query with many results to paginate over"""
+        resultCount = result("Asymmetric")
+        ok = resultCount >= 5
+        self.assertTrue(ok)
+        logger.info("Structure type exact match: symmetry type: (%s), count: (%d), ok: (%r)", "Asymmetric", resultCount, ok)
+
+        resultCount = result("symmetric")
+        ok = resultCount == 0
+        self.assertTrue(ok)
+        logger.info("Structure type exact match: symmetry type: (%s), count: (%d), ok: (%r)", "symmetric", resultCount, ok)
+
+    def testBatchConcurrent(self):
+        """Run independent queries concurrently through the shared HTTP session, and check that each
+        gets its own results. The queries are bound by the round trip to the search API, so the
+        batch takes about as long as its slowest query. The search cache is bypassed, so that
+        each query reaches the search API even if another test already sent it."""
+        batch = {
+            # name: (query, return type, identifier expected in the results)
+            "example1": (_exampleQuery1(), "assembly", "1FYL-1"),
+            "ids": (self.__idsQuery, "entry", "4HHB"),
+            "single": (_entry_in("5T89"), "entry", "5T89"),
+        }
+        with mock.patch.dict(os.environ, {SEARCH_CACHE_ENV: "0"}):
+            results = dict(zip(batch, _runConcurrently(lambda case: _contains(case[0](case[1]), case[2]), list(batch.values()))))
+        for name, (_, _, expectedId) in batch.items():
+            ok, seen = results[name]
+            self.assertTrue(ok)
+            logger.info("Concurrent query %s: read: (%d), (%s) in results, ok: (%r)", name, seen, expectedId, ok)
+
+    def testLargeCount(self):
+        """Test a generic text query with many results: count them, and walk the first few pages
+        of results with a small page size. Server throttling (429s) is handled by the retry
+        policy of the shared HTTP session."""
+        rows, pages = 50, 5
         try:
             q1 = TextQuery("coli")
-            resultL = list(q1())
-            ok = len(resultL) > 100000
-            logger.info("Large search resultL length: (%d) ok: (%r)", len(resultL), ok)
+            resultCount = q1(return_counts=True)
+            ok = resultCount > 100000
+            logger.info("Large search result count: (%d) ok: (%r)", resultCount, ok)
+            result = list(islice(Session(q1, rows=rows), rows * pages))
         except requests.exceptions.HTTPError:
-            ok = False
+            ok, result = False, []
         self.assertTrue(ok)
+        self.assertEqual(len(result), rows * pages)
+        self.assertEqual(len(set(result)), rows * pages)  # pages don't overlap
+        logger.info("Walked %d pages of %d results", pages, rows)
 
     def testChemSearch(self):
         """Test the chemical attribute search using both the operator and
         fluent syntaxes. """
         q1 = attrs.drugbank_info.brand_names.contains_phrase("Tylenol")  # 111 results 19/06/23
-        result = list(q1())
-        ok = len(result) > 0
+        resultCount = q1(return_counts=True)
+        ok = resultCount > 0
         self.assertTrue(ok)
-        ok2 = "1TYL" in result
-        logger.info("Chemical Search Operator Syntax: result length: (%d), ok: (%r), ok2: (%r)", len(result), ok, ok2)
+        logger.info("Chemical Search Operator Syntax: result length: (%d), ok: (%r)", resultCount, ok)
 
         result = TextQuery("Hemoglobin")\
             .and_("chem_comp.name", CHEMICAL_ATTRIBUTE_SEARCH_SERVICE).contains_phrase("adenine")
         # result = set(result("assembly"))
         q1 = TextQuery("Hemoglobin")
-        q2 = attrs.chem_comp.name.contains_phrase("adenine")
+        q2 = _CHEM_NAME.contains_phrase("adenine")
         result2 = q1 & q2
         # result2 = set(result2("assembly"))
         ok = result == result2  # check why this doesn't work tomorrow
-        logger.info("result of first query:")
-        logger.info(result)
-        logger.info("result of second query:")
-        logger.info(result2)
+        logger.debug("result of first query: %s", result)
+        logger.debug("result of second query: %s", result2)
         self.assertTrue(ok)
-        resultL = list(result2())
-        ok2 = "6FJH" in resultL
+        ok2 = "6FJH" in result2()  # stops paginating once the id is found
         self.assertTrue(ok2)
-        logger.info("Chemical Search Fluent Syntax: result length: (%d), ok: (%r), ok2: (%r)", len(resultL), ok, ok2)
+        logger.info("Chemical Search Fluent Syntax: ok: (%r), ok2: (%r)", ok, ok2)
 
     def testMismatch(self):
         """Negative test - test running a chemical attribute query but with structure attribute service type.
         Expected failure."""
-        try:
-            query = TextQuery('"hemoglobin"')\
-                .and_("rcsb_chem_comp.name", STRUCTURE_ATTRIBUTE_SEARCH_SERVICE).contains_phrase("adenine")\
-                .exec("assembly")
-            resultL = list(query)
-            ok = len(resultL) < 0  # set this to false as it should fail
-        except requests.exceptions.HTTPError:
-            ok = True
-        self.assertTrue(ok)
+        with _stubSearch(400) as get:  # the search API rejects chemical attributes for the structure service
+            try:
+                query = TextQuery('"hemoglobin"')\
+                    .and_("rcsb_chem_comp.name", STRUCTURE_ATTRIBUTE_SEARCH_SERVICE).contains_phrase("adenine")\
+                    .exec("assembly")
+                resultL = list(query)
+                ok = len(resultL) < 0  # set this to false as it should fail
+            except requests.exceptions.HTTPError:
+                ok = True
+        self.assertTrue(ok)
+        self.assertTrue(get.called)
+        sent = _sentQuery(get)  # the chemical attribute is sent with the structure attribute service
+        self.assertEqual(sent["nodes"][0]["service"], "full_text")
+        self.assertEqual(sent["nodes"][1]["service"], STRUCTURE_ATTRIBUTE_SEARCH_SERVICE)
+        self.assertEqual(sent["nodes"][1]["parameters"]["attribute"], "rcsb_chem_comp.name")
+        self.assertEqual(sent["nodes"][1]["parameters"]["value"], "adenine")
         logger.info("Mismatch test: ok: (%r)", ok)
 
     def testCSMquery(self):
         """Test firing off a single query that includes Computed Structure Models. Making sure the result is not None"""
-        q1 = AttributeQuery("rcsb_entry_container_identifiers.entry_id", operator="in", value=["AF_AFO87296F1"])  # entry ID for specific computed structure model of hemoglobin
+        q1 = _entry_in("AF_AFO87296F1")  # entry ID for specific computed structure model of hemoglobin
         session = Session(q1, return_content_type=["computational", "experimental"])
         result = session._single_query()
         ok = result is not None
@@ -505,60 +886,54 @@ class SearchTests(unittest.TestCase):
     def testSequenceQuery(self):
         """Test firing off a Sequence query"""
         # Sequence query with hemoglobin protein sequence (id: 4HHB). Default parameters
-        q1 = SequenceQuery("VLSPADKTNVKAAWGKVGAHAGEYGAEALERMFLSFPTTKTYFPHFDLSHGSAQVKGHGKKVADALTNAVAHVDDMPNALSALSDLHAHKLRVDPVNFKLLSHCLLVTLAAHLPAEFTPAVHASLDKFLASVSTVLTSKYR")
-        result = list(q1())
-        result_len = len(result)
-        ok = result_len > 0  # this query displays 706 ids in pdb website search function
+        q1 = SequenceQuery(_HBB_ALPHA)
+        ok = next(iter(q1()), None) is not None  # this query displays 706 ids in pdb website search function
+        self.assertTrue(ok)
         logger.info("Sequence query results correctly displays ids: (%r)", ok)
 
         # Sequence query (id: 4HHB) with custom parameters
-        q1 = SequenceQuery("VLSPADKTNVKAAWGKVGAHAGEYGAEALERMFLSFPTTKTYFPHFDLSHGSAQVKGHGKKVADALTNAVAHVDDMPNALSALSDLHAHKLRVDPVNFKLLSHCLLVTLAAHLPAEFTPAVHASLDKFLASVSTVLTSKYR",
-                           evalue_cutoff=0.01, identity_cutoff=0.9)
-        result = list(q1())
-        result_len = len(result)
-        ok = result_len > 0  # this query displays 313 ids in pdb website search function
+        q1 = SequenceQuery(_HBB_ALPHA, evalue_cutoff=0.01, identity_cutoff=0.9)
+        ok = next(iter(q1()), None) is not None  # this query displays 313 ids in pdb website search function
+        self.assertTrue(ok)
         logger.info("Sequence query results correctly displays ids with custom parameters: (%r)", ok)
 
     def testSeqMotifQuery(self):
         """Test firing off a SeqMotif query"""
         q1 = SeqMotifQuery("RK")  # basic test, make sure standard query is instantiated properly
-        result = list(q1())
-        ok = len(result) > 0
+        ok = next(iter(q1()), None) is not None
         self.assertTrue(ok)
-        logger.info("Basic SeqMotif query results: result_length : (%d), ok : (%r)", len(result), ok)
+        logger.info("Basic SeqMotif query results: ok : (%r)", ok)
 
         q2 = SeqMotifQuery("FFFFF", sequence_type="dna")  # test a DNA query, this should yield no results
-        try:
-            result = list(q2())
-        except requests.exceptions.HTTPError as e:
-            logger.error("HTTPError occurred: %s", e)
-            result = []
-        ok = len(result) == 0
+        with _stubSearch(204) as get:
+            first = next(iter(q2()), None)
+        ok = first is None
         self.assertTrue(ok)
-        logger.info("Basic DNA SeqMotif query results: result_length : (%d) (this should be 0), ok : (%r)", len(result), ok)
+        sent = _sentQuery(get)
+        self.assertEqual(sent["service"], "seqmotif")
+        self.assertEqual(sent["parameters"], {"value": "FFFFF", "pattern_type": "simple", "sequence_type": "dna"})
+        logger.info("Basic DNA SeqMotif query results: (this should be empty), ok : (%r)", ok)
 
         q3 = SeqMotifQuery("CCGGCG", sequence_type="dna")
-        result = list(q3())
-        ok = len(result) > 0
+        ok = next(iter(q3()), None) is not None
         self.assertTrue(ok)
-        logger.info("Basic Functional DNA query results: result_length : (%d), ok : (%r)", len(result), ok)
+        logger.info("Basic Functional DNA query results: ok : (%r)", ok)
 
         # rna query
         q4 = SeqMotifQuery("AUXAU", sequence_type="rna")  # X is a variable for any amino acid in that position
-        result = list(q4())
-        ok = len(result) > 0
+        ok = next(iter(q4()), None) is not None
         self.assertTrue(ok)
-        logger.info("Basic Functional RNA query results: result_length : (%d), ok : (%r)", len(result), ok)
+        logger.info("Basic Functional RNA query results: ok : (%r)", ok)
 
         q5 = SeqMotifQuery("ATUAC")  # An rna query with T should yield no results
-        try:
-            result = list(q5())
-        except requests.exceptions.HTTPError as e:
-            logger.error("HTTPError occurred: %s", e)
-            result = []
-        ok = len(result) == 0
+        with _stubSearch(204) as get:
+            first = next(iter(q5()), None)
+        ok = first is None
         self.assertTrue(ok)
-        logger.info("Basic Non-functional DNA query results: result_length : (%d), ok : (%r)", len(result), ok)
+        sent = _sentQuery(get)
+        self.assertEqual(sent["service"], "seqmotif")
+        self.assertEqual(sent["parameters"]["value"], "ATUAC")
+        logger.info("Basic Non-functional DNA query results: (this should be empty), ok : (%r)", ok)
 
         ok = False
         try:
@@ -571,7 +946,7 @@ class SearchTests(unittest.TestCase):
         ok = False
         try:
             q1 = SeqMotifQuery("AAAA", "nothing", "nothing")  # this should fail
-            _ = list(q1())
+            _ = next(iter(q1()), None)
         except requests.exceptions.HTTPError:
             ok = True
         self.assertTrue(ok)
@@ -579,94 +954,40 @@ class SearchTests(unittest.TestCase):
 
     def testFileUpload(self):
         """Test uploading a file. Used for structure queries.
-        As a unique URL is generated each time, the only common
+        As a unique URL is generated for each new upload, the only common
         denominator is that the return URL contains the file
         name at the end of it, and that the first part of the
         URL is the same."""
 
-        hemo = self.__4hhbCif
-        x = fileUpload(hemo)
-        ok = (x[x.rfind("/") + 1:]) == "4hhb.bcif"  # check that end of file name is 4hhb.cif
-        self.assertTrue(ok)
-        logger.info(".cif File Upload check one: (%r)", ok)
+        # (file, format, name of the uploaded file, label). Uploads are independent, so they run concurrently
+        uploads = [
+            (_4HHB_CIF, "cif", "4hhb.bcif", ".cif"),
+            (_7N0R_CIF_GZ, "cif", "7n0r.bcif", ".cif.gz"),  # gz files should also work by default
+            (_4HHB_PDB, "pdb", "4hhb.bcif", ".pdb"),  # for non-cif files provide file extension
+            (_7N0R_PDB_GZ, "pdb", "7n0r.bcif", ".pdb.gz"),  # PDB Zip files should work as well.
+            (_4HHB_BCIF, "bcif", "4hhb.bcif", ".bcif"),  # must specify that file you are providing is bcif
+            (_4HHB_ASSEMBLY1, "cif", "4hhb-assembly1.bcif", ".cif.gz Assembly"),
+            (_4HHB_PDB1, "pdb", "4hhb.pdb1.bcif", ".pdb1"),
+            (_4HHB_PDB1_GZ, "pdb", "4hhb.pdb1.bcif", ".pdb1.gz"),
+        ]
+        urls = _runConcurrently(lambda upload: fileUpload(upload[0], upload[1]), uploads)
 
-        ok = RETURN_UP_URL in x  # check that beginning of URL is formed correctly. This is admittedly rather redundant.
-        self.assertTrue(ok)
-        logger.info(".cif File Upload check two: (%r)", ok)
+        for (_, _, fileName, label), x in zip(uploads, urls):
+            ok = _tail(x) == fileName  # check that end of URL is the name of the uploaded file
+            self.assertTrue(ok)
+            logger.info("%s File Upload check one: (%r)", label, ok)
 
-        zipfile = self.__7n0rCifGz  # gz files should also work by default
-        x = fileUpload(zipfile)
-        ok = (x[x.rfind("/") + 1:]) == "7n0r.bcif"
-        self.assertTrue(ok)
-        logger.info(".cif.gz File Upload check one: (%r)", ok)
+            ok = RETURN_UP_URL in x  # check that beginning of URL is formed correctly.
+            self.assertTrue(ok)
+            logger.info("%s File Upload check two: (%r)", label, ok)
 
-        ok = RETURN_UP_URL in x
+        ok = fileUpload(_4HHB_CIF) == urls[0]  # the same file is not uploaded again while the previous upload is available
         self.assertTrue(ok)
-        logger.info(".cif.gz File Upload check two: (%r)", ok)
-
-        pdbfile = self.__4hhbPdb
-        x = fileUpload(pdbfile, "pdb")  # for non-cif files provide file extension
-        ok = (x[x.rfind("/") + 1:]) == "4hhb.bcif"  # check that end of file name is 4hhb.bcif
-        self.assertTrue(ok)
-        logger.info(".pdb File Upload check one: (%r)", ok)
-
-        ok = RETURN_UP_URL in x
-        self.assertTrue(ok)
-        logger.info(".pdb File Upload check two: (%r)", ok)
-
-        zippdb = self.__7n0rPdbGz  # PDB Zip files should work as well.
-        x = fileUpload(zippdb, "pdb")
-        ok = (x[x.rfind("/") + 1:]) == "7n0r.bcif"
-        self.assertTrue(ok)
-        logger.info(".pdb.gz File Upload check one: (%r)", ok)
-
-        ok = RETURN_UP_URL in x
-        self.assertTrue(ok)
-        logger.info(".pdb.gz File Upload check two: (%r)", ok)
-
-        hemobcif = self.__4hhbBcif
-        x = fileUpload(hemobcif, "bcif")  # must specify that file you are providing is bcif
-        ok = (x[x.rfind("/") + 1:]) == "4hhb.bcif"  # check that end of file name is 4hhb.bcif
-        self.assertTrue(ok)
-        logger.info(".bcif File Upload check one: (%r)", ok)
-
-        ok = RETURN_UP_URL in x  # check that beginning of URL is formed correctly.
-        self.assertTrue(ok)
-        logger.info(".bcif File Upload check two: (%r)", ok)
-
-        hemoAssem = self.__4hhbAssembly1
-        x = fileUpload(hemoAssem)
-        ok = (x[x.rfind("/") + 1:]) == "4hhb-assembly1.bcif"
-        self.assertTrue(ok)
-        logger.info(".cif.gz Assembly File Upload check one: (%r)", ok)
-
-        ok = RETURN_UP_URL in x  # check that beginning of URL is formed correctly.
-        self.assertTrue(ok)
-        logger.info(".cif.gz Assembly File Upload check two: (%r)", ok)
-
-        hemopdb1 = self.__4hhbpdb1
-        x = fileUpload(hemopdb1, "pdb")
-        ok = (x[x.rfind("/") + 1:]) == "4hhb.pdb1.bcif"
-        self.assertTrue(ok)
-        logger.info(".pdb1 File Upload check one: (%r)", ok)
-
-        ok = RETURN_UP_URL in x  # check that beginning of URL is formed correctly.
-        self.assertTrue(ok)
-        logger.info(".pdb1 File Upload check two: (%r)", ok)
-
-        hemopdb1gz = self.__4hhbpdb1Gz
-        x = fileUpload(hemopdb1gz, "pdb")
-        ok = (x[x.rfind("/") + 1:]) == "4hhb.pdb1.bcif"
-        self.assertTrue(ok)
-        logger.info(".pdb1.gz File Upload check one: (%r)", ok)
-
-        ok = RETURN_UP_URL in x  # check that beginning of URL is formed correctly.
-        self.assertTrue(ok)
-        logger.info(".pdb1.gz File Upload check two: (%r)", ok)
+        logger.info(".cif File Upload check three: (%r)", ok)
 
         # test error handling
 
-        invalid = self.__invalidTxt
+        invalid = _INVALID_TXT
         ok = False
         try:
             _ = fileUpload(invalid, "bcif")
@@ -677,145 +998,51 @@ class SearchTests(unittest.TestCase):
 
     def testStructSimQuery(self):
         """Test firing off a structure similarity query"""
-        # Basic query - assembly ID
-        q1 = StructSimilarityQuery(entry_id="4HHB")
-        result = list(q1())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Basic Structure Similarity query results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with chain ID
-        q2 = StructSimilarityQuery(structure_search_type="entry_id",
-                                   entry_id="4HHB",
-                                   structure_input_type="chain_id",
-                                   chain_id="A",
-                                   target_search_space="polymer_entity_instance")
-        result = list(q2())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Query with chain ID results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with file url
-        q3 = StructSimilarityQuery(structure_search_type="file_url",
-                                   file_url="https://files.rcsb.org/view/4HHB.cif",
-                                   file_format="cif")
-        result = list(q3())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Query with file url results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with file upload
-        q4 = StructSimilarityQuery(structure_search_type="file_upload",
-                                   file_path=self.__4hhbCif,
-                                   file_format="cif")
-        result = list(q4())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Query with file upload results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with relaxed operator
-        q5 = StructSimilarityQuery(structure_search_type="entry_id",
-                                   entry_id="4HHB",
-                                   operator="relaxed_shape_match")
-        result = list(q5())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Query with relaxed operator results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with specifically polymer entity instance search space
-        q6 = StructSimilarityQuery(structure_search_type="entry_id",
-                                   entry_id="4HHB",
-                                   structure_input_type="chain_id",
-                                   chain_id="B",
-                                   operator="relaxed_shape_match",
-                                   target_search_space="polymer_entity_instance")
-        result = list(q6())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Query with polymer entity instance results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # File upload query using 4HHB Assembly 1 - cif zip file
-        q7 = StructSimilarityQuery(structure_search_type="file_upload",
-                                   file_path=self.__4hhbAssembly1,
-                                   file_format="cif")
-        result = list(q7())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("File upload query using 4HHB Assembly 1 cif zip file results : (%d), ok : (%r)", len(result), ok)
-
-        # File upload query using 4HHB PDB file
-        q8 = StructSimilarityQuery(structure_search_type="file_upload",
-                                   file_path=self.__4hhbPdb,
-                                   file_format="pdb")
-        result = list(q8())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("File upload query using 4HHB PDB file results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # File upload query using 4HHB bcif file
-        q9 = StructSimilarityQuery(structure_search_type="file_upload",
-                                   file_path=self.__4hhbBcif,
-                                   file_format="bcif")
-        result = list(q9())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("File upload query using 4HHB bcif file results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # File url query with mmcif file format, relaxed operator, and chains target search space
-        q10 = StructSimilarityQuery(structure_search_type="file_url",
-                                    file_url="https://files.rcsb.org/view/4HHB.cif",
-                                    file_format="cif",
-                                    operator="relaxed_shape_match",
-                                    target_search_space="polymer_entity_instance")
-        result = list(q10())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("File url query using mmcif file format, relaxed, and chains: result length : (%d), ok : (%r)", len(result), ok)
-
-        # File url query with wrong combination of fire url and format (should fail)
-        ok = False
-        try:
-            q11 = StructSimilarityQuery(structure_search_type="file_url",
-                                        file_url="https://files.rcsb.org/view/4HHB.cif",
-                                        file_format="pdb")
-            result = list(q11())
-        except requests.HTTPError:
-            ok = True
-        self.assertTrue(ok)
-        logger.info("File url query with wrong file format failed successfully : (%r)", ok)
+        def firstResult(kwargs):
+            # Only the first page of results is needed to tell whether there are any
+            return next(iter(StructSimilarityQuery(**kwargs)()), None)
+
+        result = self._runQueries({label: functools.partial(firstResult, kwargs) for label, kwargs in _STRUCT_SIM_CASES})
+        for label, _ in _STRUCT_SIM_CASES:
+            with self.subTest(label):
+                first = result(label)
+                ok = first is not None
+                self.assertTrue(ok)
+                logger.info("%s results: first=%r, ok : (%r)", label, first, ok)
+
+        # File url query with wrong combination of fire url and format (should fail, now before any request is made)
+        with _stubSearch(400) as get:
+            with self.assertRaises(ValueError):
+                StructSimilarityQuery(structure_search_type="file_url",
+                                      file_url=_4HHB_CIF_URL,
+                                      file_format="pdb")
+        self.assertFalse(get.called)
+        logger.info("File url query with wrong file format failed successfully")
 
     def testStructMotifQuery(self):
         # base example, entry ID, residues
-        Res1 = StructureMotifResidue("A", "1", 162, ["LYS", "HIS"])
-        Res2 = StructureMotifResidue("A", "1", 193, ["ASP"])
-        Res3 = StructureMotifResidue("A", "1", 192, ["LYS", "HIS", "ASP", "VAL"])
-        Res4 = StructureMotifResidue("A", "1", 191, ["LYS", "HIS", "ASP", "VAL"])
-        Res5 = StructureMotifResidue("A", "1", 190, ["LYS", "HIS", "ASP", "VAL"])
-        Res6 = StructureMotifResidue("A", "1", 189, ["LYS", "HIS", "ASP", "VAL"])
-        ResList = [Res1, Res2]
+        res = _RES
+        ResList = [res.a162, res.a193Asp]
 
         q1 = StructMotifQuery(entry_id="2MNR", residue_ids=ResList)  # Avoid positionals for StructMotifQuery... way too many things are optional in these queries
-        result = list(q1())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Basic StructMotifQuery completed successfully: (%r)", ok)
+        first = next(iter(q1()), None)
+        self.assertIsNotNone(first)
+        logger.info("Basic StructMotifQuery completed successfully: first=%r", first)
 
         # base example with file upload
-        MNR = self.__2mnr
+        MNR = _2MNR_CIF
         q2 = StructMotifQuery(structure_search_type="file_upload", file_path=MNR, file_extension="cif", residue_ids=ResList)
         # You MUST specify structure_search_type for non entry_id queries.
-        result = list(q2())
-        ok = len(result) > 0  # Note that because of a bug where two queries don't return the same result, you can't compare results from this query and previous.
-        self.assertTrue(ok)
-        logger.info("File Upload StructMotifQuery completed successfully: (%r)", ok)
+        first = next(iter(q2()), None)  # Note that because of a bug where two queries don't return the same result, you can't compare results from this query and previous.
+        self.assertIsNotNone(first)
+        logger.info("File Upload StructMotifQuery completed successfully: first=%r", first)
 
         # base example with file link
         link = "https://files.rcsb.org/view/2MNR.cif"
         q3 = StructMotifQuery(structure_search_type="file_url", url=link, file_extension="cif", residue_ids=ResList)
-        result = list(q3())
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("File URL StructMotifQuery completed successfully: (%r)", ok)
+        first = next(iter(q3()), None)
+        self.assertIsNotNone(first)
+        logger.info("File URL StructMotifQuery completed successfully: first=%r", first)
 
         # invalid queries
 
@@ -857,9 +1084,9 @@ class SearchTests(unittest.TestCase):
 
         # make sure no more than 16 max exchanges total per query
         ok = False
-        _ = StructMotifQuery(entry_id="2MNR", residue_ids=[Res3, Res4, Res5, Res6])  # this should cause no issues, 16
+        _ = StructMotifQuery(entry_id="2MNR", residue_ids=[res.a192, res.a191, res.a190, res.a189])  # this should cause no issues, 16
         try:
-            _ = StructMotifQuery(entry_id="2MNR", residue_ids=[Res2, Res3, Res4, Res5, Res6])  # this should crash
+            _ = StructMotifQuery(entry_id="2MNR", residue_ids=[res.a193Asp, res.a192, res.a191, res.a190, res.a189])  # this should crash
         except AssertionError:
             ok = True
         self.assertTrue(ok)
@@ -876,166 +1103,46 @@ class SearchTests(unittest.TestCase):
 
     def testChemSimilarityQuery(self):
         """Test firing off chemical similarity queries"""
-        # Basic query with default values: query type = formula and match subset = False
-        q1 = ChemSimilarityQuery(value="C12 H17 N4 O S")
-        result = list(q1())
-        ok = len(result) > 0
-        logger.info("Basic query with default values results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # query with type = formula and match subset = True
-        q2 = ChemSimilarityQuery(value="C12 H28 O4",
-                                 query_type="formula",
-                                 match_subset=True)
-        result = list(q2())
-        ok = len(result) > 0
-        logger.info("Query with type = formula and match subset = True results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with type = descriptor, descriptor type = SMILES, match type = similar ligands (sterospecific) or graph-relaxed-stereo
-        q3 = ChemSimilarityQuery(value="Cc1c(sc[n+]1Cc2cnc(nc2N)C)CCO",
-                                 query_type="descriptor",
-                                 descriptor_type="SMILES",
-                                 match_type="graph-relaxed-stereo")
-        result = list(q3())
-        ok = len(result) > 0
-        logger.info("Query with using type - descriptor, SMILES, and graph-relaxed-stereo results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with type = descriptor, descriptor type = SMILES, match type = similar ligands (including stereoisomers) or graph-relaxed
-        q4 = ChemSimilarityQuery(value="Cc1c(sc[n+]1Cc2cnc(nc2N)C)CCO",
-                                 query_type="descriptor",
-                                 descriptor_type="SMILES",
-                                 match_type="graph-relaxed")
-        result = list(q4())
-        ok = len(result) > 0
-        logger.info("Query with using type - descriptor, SMILES, and graph-relaxed results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with type = descriptor, descriptor type = SMILES, match type = similar ligands (quick screen) or fingerprint-similarity
-        q5 = ChemSimilarityQuery(value="Cc1c(sc[n+]1Cc2cnc(nc2N)C)CCO",
-                                 query_type="descriptor",
-                                 descriptor_type="SMILES",
-                                 match_type="fingerprint-similarity")
-        result = list(q5())
-        ok = len(result) > 0
-        logger.info("Query with using type - descriptor, SMILES, and fingerprint-similarity results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with type = descriptor, descriptor type = InChI, match type = substructure (sterospecific) or sub-struct-graph-relaxed-stereo
-        q6 = ChemSimilarityQuery(value="InChI=1S/C13H10N2O4/c16-10-6-5-9(11(17)14-10)15-12(18)7-3-1-2-4-8(7)13(15)19/h1-4,9H,5-6H2,(H,14,16,17)/t9-/m0/s1",
-                                 query_type="descriptor",
-                                 descriptor_type="InChI",
-                                 match_type="sub-struct-graph-relaxed-stereo")
-        result = list(q6())
-        ok = len(result) > 0
-        logger.info("Query with using type - descriptor, InChI, and sub-struct-graph-relaxed-stereo results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with type = descriptor, descriptor type = InChI, match type = substructure (including stereoisomers) or sub-struct-graph-relaxed
-        q7 = ChemSimilarityQuery(value="InChI=1S/C13H10N2O4/c16-10-6-5-9(11(17)14-10)15-12(18)7-3-1-2-4-8(7)13(15)19/h1-4,9H,5-6H2,(H,14,16,17)/t9-/m0/s1",
-                                 query_type="descriptor",
-                                 descriptor_type="InChI",
-                                 match_type="sub-struct-graph-relaxed")
-        result = list(q7())
-        ok = len(result) > 0
-        logger.info("Query with using type - descriptor, InChI, and sub-struct-graph-relaxed results: result length : (%d), ok : (%r)", len(result), ok)
-
-        # Query with type = descriptor, descriptor type = InChI, match type = exact match or graph-exact
-        q8 = ChemSimilarityQuery(value="InChI=1S/C13H10N2O4/c16-10-6-5-9(11(17)14-10)15-12(18)7-3-1-2-4-8(7)13(15)19/h1-4,9H,5-6H2,(H,14,16,17)/t9-/m0/s1",
-                                 query_type="descriptor",
-                                 descriptor_type="InChI",
-                                 match_type="graph-exact")
-        result = list(q8())
-        ok = len(result) > 0
-        logger.info("Query with using type - descriptor, InChI, and graph-exact results: result length : (%d), ok : (%r)", len(result), ok)
+        def firstResult(kwargs):
+            # Only the first page of results is needed to tell whether there are any
+            return next(iter(ChemSimilarityQuery(**kwargs)()), None)
+
+        result = self._runQueries({label: functools.partial(firstResult, kwargs) for label, kwargs in _CHEM_SIM_CASES})
+        for label, _ in _CHEM_SIM_CASES:
+            with self.subTest(label):
+                first = result(label)
+                logger.info("%s results: first=%r", label, first)
 
         # Invalid query with invalid parameters
-        ok = False
-        try:
-            q9 = ChemSimilarityQuery(value="InChI=1S/C13H10N2O4/c16-10-6-5-9(11(17)14-10)15-12(18)7-3-1-2-4-8(7)13(15)19/h1-4,9H,5-6H2,(H,14,16,17)/t9-/m0/s1",
-                                     query_type="descriptor",
-                                     descriptor_type="something",  # unsupported parameter
-                                     match_type="something")  # unsupported parameter
-            result = list(q9())
-        except requests.HTTPError:
-            ok = True
-        self.assertTrue(ok)
-        logger.info("Descriptor query type with invalid parameters failed successfully : (%r)", ok)
+        with _stubSearch(400) as get:
+            with self.assertRaises(ValueError):
+                ChemSimilarityQuery(value=_INCHI,
+                                    query_type="descriptor",
+                                    descriptor_type="something",  # unsupported parameter
+                                    match_type="something")  # unsupported parameter
+        self.assertFalse(get.called)
+        logger.info("Descriptor query type with invalid parameters failed successfully")
+
+        # match_type is optional for descriptor queries, but must be supported if given
+        q10 = ChemSimilarityQuery(value=_SMILES, query_type="descriptor", descriptor_type="SMILES")
+        self.assertIsNone(q10.to_dict()["parameters"]["match_type"])
+        with self.assertRaises(ValueError):
+            ChemSimilarityQuery(value=_SMILES, query_type="descriptor", descriptor_type="SMILES", match_type="something")
 
     def testReturnCounts(self):
         """Test firing off results count requests"""
-        # Attribute query test
-        q1 = AttributeQuery("exptl.method", "exact_match", "FLUORESCENCE TRANSFER")
-        result = q1(return_type="assembly", return_counts=True)
-        ok = result == len(list(q1("assembly")))
-        self.assertTrue(ok)
-        logger.info("Counting results of structural Attribute query: (%d), ok : (%r)", result, ok)
-
-        q2 = TextQuery("hemoglobin")
-        result = q2(return_counts=True)
-        ok = result == len(list(q2()))
-        self.assertTrue(ok)
-        logger.info("Counting results of Text query: (%d), ok : (%r)", result, ok)
+        # Counts are checked against the total_count reported with the first page of the paginated results
 
-        q3 = AttributeQuery(
-            "drugbank_info.brand_names",
-            "contains_phrase",
-            "tylenol",
-            CHEMICAL_ATTRIBUTE_SEARCH_SERVICE,  # this constant specifies "text_chem" service
-        )
-        result = q3(return_counts=True)
-        ok = result == len(list(q3()))
-        self.assertTrue(ok)
-        logger.info("Counting results of chemical Attribute query: (%d), ok : (%r)", result, ok)
-
-        q4 = SequenceQuery(
-            "MTEYKLVVVGAGGVGKSALTIQLIQNHFVDEYDPTIEDSYRKQVVIDGET"
-            + "CLLDILDTAGQEEYSAMRDQYMRTGEGFLCVFAINNTKSFEDIHQYREQI"
-            + "KRVKDSDDVPMVLVGNKCDLPARTVETRQAQDLARSYGIPYIETSAKTRQ"
-            + "GVEDAFYTLVREIRQHKLRKLNPPDESGPGCMNCKCVIS",
-            1,
-            0.9,
-        )
-        result = q4(return_counts=True)
-        ok = result == len(list(q4()))
-        self.assertTrue(ok)
-        logger.info("Counting results of Sequence query: (%d), ok : (%r)", result, ok)
-
-        q5 = SeqMotifQuery(
-            "C-x(2,4)-C-x(3)-[LIVMFYWC]-x(8)-H-x(3,5)-H.",
-            pattern_type="prosite",
-            sequence_type="protein",
-        )
-        result = q5(return_counts=True)
-        ok = result == len(list(q5()))
-        self.assertTrue(ok)
-        logger.info("Counting results of Sequence motif query: (%d), ok : (%r)", result, ok)
-
-        q6 = StructSimilarityQuery(
-            structure_search_type="entry_id",
-            entry_id="4HHB",  # Structure Similarity Query
-            structure_input_type="assembly_id",
-            assembly_id="1",
-            operator="strict_shape_match",
-            target_search_space="assembly",
-        )
-        result = q6(return_counts=True)
-        ok = result == len(list(q6()))
-        self.assertTrue(ok)
-        logger.info("Counting results of Structure similarity query: (%d), ok : (%r)", result, ok)
-
-        Res1 = StructureMotifResidue("A", "1", 162, ["LYS", "HIS"])
-        Res2 = StructureMotifResidue("A", "1", 193)
-        Res3 = StructureMotifResidue("A", "1", 219)
-        Res4 = StructureMotifResidue("A", "1", 245, ["GLU", "ASP", "ASN"])
-        Res5 = StructureMotifResidue("A", "1", 295, ["HIS", "LYS"])
-        ResList = [Res1, Res2, Res3, Res4, Res5]
-        q7 = StructMotifQuery(entry_id="2MNR", residue_ids=ResList)
-        result = q7(return_counts=True)
-        ok = result == len(list(q7()))
-        self.assertTrue(ok)
-        logger.info("Counting results of Structure motif query: (%d), ok : (%r)", result, ok)
+        def counts(query, options):
+            return query(return_counts=True, **options), query(**options).count
 
-        q8 = ChemSimilarityQuery(value="C12 H17 N4 O S")
-        result = q8(return_counts=True)
-        ok = result == len(list(q8()))
-        self.assertTrue(ok)
-        logger.info("Counting results of Chemical similarity query: (%d), ok : (%r)", result, ok)
+        countsOf = self._runQueries({label: functools.partial(counts, query, options) for label, query, options in _RETURN_COUNTS_CASES})
+        for label, _, _ in _RETURN_COUNTS_CASES:
+            with self.subTest(label):
+                returnCount, totalCount = countsOf(label)
+                ok = returnCount == totalCount
+                self.assertTrue(ok)
+                logger.info("Counting results of %s: (%d), ok : (%r)", label, returnCount, ok)
 
         ok = False
         q9 = AttributeQuery("invalid_identifier", operator="exact_match", value="ERROR", service="textx")
@@ -1056,13 +1163,14 @@ class SearchTests(unittest.TestCase):
         q12 = AttributeQuery(attribute="rcsb_struct_symmetry.symbol", operator="exact_match", value="C2")
         q13 = q11 & q12
         result = q13(return_counts=True)
-        ok = result == len(list(q13()))
+        ok = result == q13().count
         self.assertTrue(ok)
         logger.info("Counting results queries combined with &: (%d), ok : (%r)", result, ok)
 
         q14 = q11 | q12
-        result = q14(return_counts=True)
-        ok = result == len(list(q11())) + len(list(q12())) - len(list(q13()))
+        # inclusion-exclusion: |q11 or q12| = |q11| + |q12| - |q11 and q12|, using return_counts requests only
+        result, count11, count12, count13 = _runConcurrently(lambda q: q(return_counts=True), [q14, q11, q12, q13])
+        ok = result == count11 + count12 - count13
         self.assertTrue(ok)
         logger.info("Counting results of queries combined with &: (%d), ok : (%r)", result, ok)
 
@@ -1086,290 +1194,132 @@ class SearchTests(unittest.TestCase):
 
     def testFacetQuery(self):
         """Test firing off Facets queries and Filter Facet queries"""
-
-        q1 = AttributeQuery(
-            attribute="rcsb_accession_info.initial_release_date",
-            operator="greater",
-            value="2019-08-20",
-        )
-        result = q1(facets=[Facet("Methods", "terms", "exptl.method")]).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Basic Facet query results: result length : (%d), ok : (%r)", len(result), ok)
-
-        q1 = AttributeQuery(
-            attribute="rcsb_entry_info.structure_determination_methodology",
-            operator="exact_match",
-            value="experimental",
-        )
-        result = q1(facets=Facet("Journals", "terms", "rcsb_primary_citation.rcsb_journal_abbrev", min_interval_population=1000)).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Terms Facet query on Empty query results: result length : (%d), ok : (%r)", len(result), ok)
-
-        q1 = AttributeQuery(
-            attribute="rcsb_entry_info.structure_determination_methodology",
-            operator="exact_match",
-            value="experimental",
-        )
-        result = q1(
-            return_type="polymer_entity",
-            facets=Facet("Formula Weight", "histogram", "rcsb_polymer_entity.formula_weight", interval=50, min_interval_population=1)
-        ).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Histogram Facet query results: result length : (%d), ok : (%r)", len(result), ok)
-
-        q1 = AttributeQuery(
-            attribute="rcsb_entry_info.structure_determination_methodology",
-            operator="exact_match",
-            value="experimental",
-        )
-        result = q1(
-            return_type="polymer_entity",
-            facets=Facet("Release Date", "date_histogram", "rcsb_accession_info.initial_release_date", interval="year", min_interval_population=1)
-        ).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Date Histogram Facet query results: result length : (%d), ok : (%r)", len(result), ok)
-
-        q1 = AttributeQuery(
-            attribute="rcsb_entry_info.structure_determination_methodology",
-            operator="exact_match",
-            value="experimental",
-        )
-        result = q1(
-            facets=Facet(
-                "Resolution Combined",
-                "range",
-                "rcsb_entry_info.resolution_combined",
-                ranges=[Range(None, 2), Range(2, 2.2), Range(2.2, 2.4), Range(4.6, None)]
-            )
-        ).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Range Facet query results: result length : (%d), ok : (%r)", len(result), ok)
-
-        q1 = AttributeQuery(
-            attribute="rcsb_entry_info.structure_determination_methodology",
-            operator="exact_match",
-            value="experimental"
-        )
-        result = q1(
-            facets=Facet(
-                "Release Date",
-                "date_range",
-                "rcsb_accession_info.initial_release_date",
-                ranges=[Range(None, "2020-06-01||-12M"), Range("2020-06-01", "2020-06-01||+12M"), Range("2020-06-01||+12M", None)]
-            )
-        ).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Date Range Facet query results: result length : (%d), ok : (%r)", len(result), ok)
-
-        q1 = AttributeQuery(
-            attribute="rcsb_entry_info.structure_determination_methodology",
-            operator="exact_match",
-            value="experimental",
-        )
-        result = q1(
-            facets=Facet("Organism Names Count", "cardinality", "rcsb_entity_source_organism.ncbi_scientific_name")
-        ).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Cardinality Facet query results: result length : (%d), ok : (%r)", len(result), ok)
+        q1 = self._METHODOLOGY_Q
 
         f1 = Facet("Polymer Entity Types", "terms", "rcsb_entry_info.selected_polymer_entity_types")
         f2 = Facet("Release Date", "date_histogram", "rcsb_accession_info.initial_release_date", interval="year")
-        q1 = AttributeQuery(
-            attribute="rcsb_entry_info.structure_determination_methodology",
-            operator="exact_match",
-            value="experimental",
-        )
-        result = q1(facets=Facet("Experimental Method", "terms", "rcsb_entry_info.experimental_method", nested_facets=[f1, f2])).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Multi-dimensional Facet query results: result length : (%d), ok : (%r)", len(result), ok)
 
         tf1 = TerminalFilter("rcsb_polymer_instance_annotation.type", "exact_match", value="CATH")
         tf2 = TerminalFilter("rcsb_polymer_instance_annotation.annotation_lineage.id", "in", ["2.140.10.30", "2.120.10.80"])
         ff1 = FilterFacet(tf2, Facet("CATH Domains", "terms", "rcsb_polymer_instance_annotation.annotation_lineage.id", min_interval_population=1))
         ff2 = FilterFacet(tf1, ff1)
-        q1 = AttributeQuery(
-            attribute="rcsb_entry_info.structure_determination_methodology",
-            operator="exact_match",
-            value="experimental",
-        )
-        result = q1(return_type="polymer_instance", facets=[ff2]).facets
-        print(f"filterfacet:\n {result}")
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Filter Facet query results: result length : (%d), ok : (%r)", len(result), ok)
 
         tf3 = TerminalFilter("rcsb_struct_symmetry.kind", "exact_match", value="Global Symmetry", negation=False)
         f3 = Facet("ec_terms", "terms", "rcsb_polymer_entity.rcsb_ec_lineage.id")
         f4 = Facet("sym_symbol_terms", "terms", "rcsb_struct_symmetry.symbol", nested_facets=f3)
         ff3 = FilterFacet(tf3, f4)
-        q2 = AttributeQuery("rcsb_assembly_info.polymer_entity_count", operator="equals", value=1)
+        q2 = self._Q_PEC_EQ_1
         q3 = AttributeQuery("rcsb_assembly_info.polymer_entity_instance_count", operator="greater", value=1)
         q4 = q2 & q3
-        result = q4(return_type="assembly", facets=ff3).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Filter Facet query with Multi-dimensional facets results: result length : (%d), ok : (%r)", len(result), ok)
 
-        tf4 = TerminalFilter("rcsb_polymer_entity_group_membership.aggregation_method", "exact_match", value="sequence_identity")
-        tf5 = TerminalFilter("rcsb_polymer_entity_group_membership.similarity_cutoff", "equals", value=100)
-        gf1 = GroupFilter("and", [tf4, tf5])
+        gf1 = GroupFilter("and", [self._TF_SEQID, self._TF_SIM100])
         ff4 = FilterFacet(gf1, Facet("Distinct Protein Sequence Count", "cardinality", "rcsb_polymer_entity_group_membership.group_id"))
-        q1 = AttributeQuery(
-            attribute="rcsb_entry_info.structure_determination_methodology",
-            operator="exact_match",
-            value="experimental",
-        )
-        result = q1(return_type="polymer_entity", facets=ff4).facets
-        ok = len(result) > 0
-        self.assertTrue(ok)
-        logger.info("Group Filter Facet query results: result length : (%d), ok : (%r)", len(result), ok)
 
-    def testGroupBy(self):
-        with self.subTest("1. Group by deposit ID + ranking_criteria_type"):
-            # TerminalFilter
-            try:
-                tf = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.aggregation_method", operator="exact_match", value="sequence_identity")
-                query = AttributeQuery(
-                    attribute="rcsb_entity_source_organism.scientific_name",
-                    operator="exact_match",
-                    value="gallus gallus",
-                )
-                list(query(
-                    group_by=GroupBy(
-                        aggregation_method="matching_deposit_group_id",
-                        ranking_criteria_type=RankingCriteriaType(sort_by="score", filter=tf, direction="asc"),
-                    )))
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
+        # Facets sharing a query and return_type are bundled into a single request
+        entryFacets = [
+            Facet("Journals", "terms", "rcsb_primary_citation.rcsb_journal_abbrev", min_interval_population=1000),
+            Facet("Resolution Combined", "range", "rcsb_entry_info.resolution_combined", ranges=[Range(None, 2), Range(2, 2.2), Range(2.2, 2.4), Range(4.6, None)]),
+            Facet("Release Date", "date_range", "rcsb_accession_info.initial_release_date",
+                  ranges=[Range(None, "2020-06-01||-12M"), Range("2020-06-01", "2020-06-01||+12M"), Range("2020-06-01||+12M", None)]),
+            Facet("Organism Names Count", "cardinality", "rcsb_entity_source_organism.ncbi_scientific_name"),
+            Facet("Experimental Method", "terms", "rcsb_entry_info.experimental_method", nested_facets=[f1, f2]),
+        ]
+        polymerEntityFacets = [
+            Facet("Formula Weight", "histogram", "rcsb_polymer_entity.formula_weight", interval=50, min_interval_population=1),
+            Facet("Release Date", "date_histogram", "rcsb_accession_info.initial_release_date", interval="year", min_interval_population=1),
+        ]
+
+        # (label, query, request options, names of the facets expected in the results; filter facets are
+        # only checked to give results). The facet queries are independent, so they run concurrently
+        cases = [
+            ("Basic Facet", AttributeQuery(attribute="rcsb_accession_info.initial_release_date", operator="greater", value="2019-08-20"),
+             dict(facets=[Facet("Methods", "terms", "exptl.method")]), {"Methods"}),
+            ("Terms, Range, Date Range, Cardinality and Multi-dimensional Facets", q1, dict(facets=entryFacets), {facet.name for facet in entryFacets}),
+            ("Histogram and Date Histogram Facets", q1, dict(return_type="polymer_entity", facets=polymerEntityFacets), {facet.name for facet in polymerEntityFacets}),
+            ("Filter Facet", q1, dict(return_type="polymer_instance", facets=[ff2]), set()),
+            ("Filter Facet query with Multi-dimensional facets", q4, dict(return_type="assembly", facets=ff3), set()),
+            ("Group Filter Facet", q1, dict(return_type="polymer_entity", facets=ff4), set()),
+        ]
+        results = _runConcurrently(lambda case: case[1](**case[2]).facets, cases)
+        for (label, _, _, expectedNames), result in zip(cases, results):
+            logger.debug("%s facets: %s", label, result)
+            ok = len(result) > 0
+            self.assertTrue(ok)
+            logger.info("%s query results: result length : (%d), ok : (%r)", label, len(result), ok)
+            missingNames = expectedNames - {facet["name"] for facet in result}
+            self.assertFalse(missingNames, f"{label}: missing facets {sorted(missingNames)!r}")
 
-            # GroupFilter
-            try:
-                tf1 = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.aggregation_method", operator="exact_match", value="electron microscopy")
-                tf2 = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.similarity_cutoff", operator="equals", value=100)
-                gf = GroupFilter(logical_operator="and", nodes=[tf1, tf2])
-                query = AttributeQuery(
-                    attribute="rcsb_entity_source_organism.scientific_name",
-                    operator="exact_match",
-                    value="gallus gallus",
-                )
-                list(query(
-                    group_by=GroupBy(
-                        aggregation_method="matching_deposit_group_id",
-                        ranking_criteria_type=RankingCriteriaType(sort_by="score", filter=gf, direction="asc"),
-                    )
-                ))
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
+    def testGroupBy(self):
+        tf = self._TF_SEQID
+        gf = self._GF_EM_AND_SIM100
+        gallusQuery = AttributeQuery(
+            attribute="rcsb_entity_source_organism.scientific_name",
+            operator="exact_match",
+            value="gallus gallus",
+        )
+        entityCountQuery = self._Q_PEC_EQ_1
+        mutationCountQuery = AttributeQuery(
+            attribute="entity_poly.rcsb_mutation_count",
+            operator="equals",
+            value=10,
+        )
 
-            # Wrong return_type
-            query = AttributeQuery(
-                attribute="rcsb_entity_source_organism.scientific_name",
-                operator="exact_match",
-                value="gallus gallus",
-            )
-            query_dict = (query(
-                return_type="polymer_entity",
+        # The wrong return_type checks only need the request parameters, which are built without sending a request,
+        # so they run first and fail fast
+        with self.subTest("0. Group by with wrong return_type"):
+            params = gallusQuery.build_params(return_type="polymer_entity", group_by=GroupBy(aggregation_method="matching_deposit_group_id"))
+            self.assertEqual(params["return_type"], "entry")
+            params = entityCountQuery.build_params(return_type="entry", group_by=self._GB_SEQID_95)
+            self.assertEqual(params["return_type"], "polymer_entity")
+            params = mutationCountQuery.build_params(return_type="entry", group_by=GroupBy(aggregation_method="matching_uniprot_accession"))
+            self.assertEqual(params["return_type"], "polymer_entity")
+
+        # The queries of all other subtests are independent; run them concurrently, and check their outcomes per subtest
+        calls = {
+            "deposit ID with TerminalFilter": lambda: list(gallusQuery(
                 group_by=GroupBy(
                     aggregation_method="matching_deposit_group_id",
-                )
-            ))._make_params()
-            self.assertEqual(query_dict["return_type"], "entry")
-
-        with self.subTest("2. Group by sequence identity"):
-            try:
-                tf1 = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.aggregation_method", operator="exact_match", value="electron microscopy")
-                tf2 = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.similarity_cutoff", operator="equals", value=100)
-                gf = GroupFilter(logical_operator="and", nodes=[tf1, tf2])
-                query = AttributeQuery(
-                    attribute="rcsb_assembly_info.polymer_entity_count",
-                    operator="equals",
-                    value=1,
-                )
-                list(query(
-                    return_type="polymer_entity",
-                    group_by=GroupBy(
-                        aggregation_method="sequence_identity",
-                        similarity_cutoff=95,
-                        ranking_criteria_type=RankingCriteriaType(sort_by="score", filter=gf, direction="asc")
-                    )
-                ))
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
-
-            # Wrong return_type
-            query = AttributeQuery(
-                attribute="rcsb_assembly_info.polymer_entity_count",
-                operator="equals",
-                value=1,
-            )
-            query_dict = (query(
-                return_type="entry",
+                    ranking_criteria_type=RankingCriteriaType(sort_by="score", filter=tf, direction="asc"),
+                ))),
+            "deposit ID with GroupFilter": lambda: list(gallusQuery(
+                group_by=GroupBy(
+                    aggregation_method="matching_deposit_group_id",
+                    ranking_criteria_type=RankingCriteriaType(sort_by="score", filter=gf, direction="asc"),
+                ))),
+            "sequence identity": lambda: list(entityCountQuery(
+                return_type="polymer_entity",
                 group_by=GroupBy(
                     aggregation_method="sequence_identity",
                     similarity_cutoff=95,
-                )
-            ))._make_params()
-            self.assertEqual(query_dict["return_type"], "polymer_entity")
-
-        with self.subTest("3. Group by UniProt Accession"):
+                    ranking_criteria_type=RankingCriteriaType(sort_by="score", filter=gf, direction="asc")
+                ))),
             # using standard sort options
-            try:
-                tf1 = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.aggregation_method", operator="exact_match", value="electron microscopy")
-                tf2 = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.similarity_cutoff", operator="equals", value=100)
-                gf = GroupFilter(logical_operator="and", nodes=[tf1, tf2])
-                query = AttributeQuery(
-                    attribute="entity_poly.rcsb_mutation_count",
-                    operator="equals",
-                    value=10,
-                )
-                list(query(
-                    return_type="polymer_entity",
-                    group_by=GroupBy(
-                        aggregation_method="matching_uniprot_accession",
-                        ranking_criteria_type=RankingCriteriaType(sort_by="score", filter=gf, direction="asc")
-                    )
-                ))
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
-
+            "UniProt accession": lambda: list(mutationCountQuery(
+                return_type="polymer_entity",
+                group_by=GroupBy(
+                    aggregation_method="matching_uniprot_accession",
+                    ranking_criteria_type=RankingCriteriaType(sort_by="score", filter=gf, direction="asc")
+                ))),
             # using uniprot specific ranking_criteria_type
-            try:
-                query = AttributeQuery(
-                    attribute="entity_poly.rcsb_mutation_count",
-                    operator="equals",
-                    value=10,
-                )
-                list(query(
-                    return_type="polymer_entity",
-                    group_by=GroupBy(
-                        aggregation_method="matching_uniprot_accession",
-                        ranking_criteria_type=RankingCriteriaType(sort_by="coverage")
-                    )
-                ))
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
-
-            # Wrong return_type
-            query = AttributeQuery(
-                attribute="entity_poly.rcsb_mutation_count",
-                operator="equals",
-                value=10,
-            )
-            query_dict = (query(
-                return_type="entry",
+            "UniProt accession with coverage": lambda: list(mutationCountQuery(
+                return_type="polymer_entity",
                 group_by=GroupBy(
                     aggregation_method="matching_uniprot_accession",
-                )
-            ))._make_params()
-            self.assertEqual(query_dict["return_type"], "polymer_entity")
+                    ranking_criteria_type=RankingCriteriaType(sort_by="coverage")
+                ))),
+        }
+        result = self._runQueries(calls)
+
+        with self.subTest("1. Group by deposit ID + ranking_criteria_type"):
+            result("deposit ID with TerminalFilter")
+            result("deposit ID with GroupFilter")
+
+        with self.subTest("2. Group by sequence identity"):
+            result("sequence identity")
+
+        with self.subTest("3. Group by UniProt Accession"):
+            result("UniProt accession")
+            result("UniProt accession with coverage")
 
     def testGroupByReturnType(self):
         query = AttributeQuery(
@@ -1377,100 +1327,55 @@ class SearchTests(unittest.TestCase):
             operator="exact_match",
             value="gallus gallus",
         )
-        with self.subTest('1. Return type "representatives"'):
-            # try running the query
-            try:
-                list(query(
-                    return_type="polymer_entity",
-                    group_by=GroupBy(
-                        aggregation_method="sequence_identity",
-                        similarity_cutoff=95,
-                    ),
-                    group_by_return_type="representatives"
-                ))
-
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
 
-            # check parameters
-            query_dict = (query(
-                return_type="polymer_entity",
-                group_by=GroupBy(
-                    aggregation_method="sequence_identity",
-                    similarity_cutoff=95,
-                ),
-                group_by_return_type="representatives"
-            ))._make_params()
-            self.assertEqual(query_dict["request_options"]["group_by_return_type"], "representatives")
-
-        with self.subTest('2. Return type "groups"'):
-            # try running the query
-            try:
-                list(query(
-                    return_type="polymer_entity",
-                    group_by=GroupBy(
-                        aggregation_method="sequence_identity",
-                        similarity_cutoff=95,
-                    ),
-                    group_by_return_type="groups"
-                ))
-
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
+        def options(groupByReturnType):
+            return dict(return_type="polymer_entity", group_by=self._GB_SEQID_95, group_by_return_type=groupByReturnType)
 
-            # check parameters
-            query_dict = (query(
-                return_type="polymer_entity",
-                group_by=GroupBy(
-                    aggregation_method="sequence_identity",
-                    similarity_cutoff=95,
-                ),
-                group_by_return_type="groups"
-            ))._make_params()
-            self.assertEqual(query_dict["request_options"]["group_by_return_type"], "groups")
+        def run(groupByReturnType):
+            return list(query(**options(groupByReturnType)))
 
-        with self.subTest('3. Try "group_by_return_type" without "group_by"'):
+        # The parameters are built without sending a request, so they are checked first
+        with self.subTest('1. Try "group_by_return_type" without "group_by"'):
             with self.assertRaises(ValueError):
-                query(return_type="polymer_entity", group_by_return_type="groups")
+                query.build_params(return_type="polymer_entity", group_by_return_type="groups")
+
+        for returnType in ("representatives", "groups"):
+            with self.subTest(f'2. Parameters of return type "{returnType}"'):
+                self.assertEqual(query.build_params(**options(returnType))["request_options"]["group_by_return_type"], returnType)
+
+        result = self._runQueries({returnType: functools.partial(run, returnType) for returnType in ("representatives", "groups")})
+
+        with self.subTest('3. Return type "representatives"'):
+            # try running the query
+            result("representatives")
+
+        with self.subTest('4. Return type "groups"'):
+            # try running the query
+            result("groups")
 
     def testSort(self):
+        query = AttributeQuery(
+            "rcsb_entity_source_organism.ncbi_scientific_name",
+            operator="exact_match",
+            value="Homo sapiens",
+        )
+        tf = self._TF_EM
+        gf = self._GF_EM_AND_SIM100
+        calls = {
+            "without filter": lambda: list(query(sort=Sort(sort_by="rcsb_assembly_info.polymer_entity_count", direction="asc"))),
+            "with TerminalFilter": lambda: list(query(sort=Sort(sort_by="rcsb_assembly_info.polymer_entity_count", direction="asc", filter=tf))),
+            "with GroupFilter": lambda: list(query(sort=Sort(sort_by="rcsb_assembly_info.polymer_entity_count", direction="asc", filter=gf))),
+        }
+        result = self._runQueries(calls)
+
         with self.subTest("1. Sorting without filter"):
-            try:
-                query = AttributeQuery(
-                    "rcsb_entity_source_organism.ncbi_scientific_name",
-                    operator="exact_match",
-                    value="Homo sapiens",
-                )
-                list(query(sort=Sort(sort_by="rcsb_assembly_info.polymer_entity_count", direction="asc")))
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
+            result("without filter")
 
         with self.subTest("1. Sorting with filter"):
             # Terminal Filter
-            try:
-                tf = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.aggregation_method", operator="exact_match", value="electron microscopy")
-                query = AttributeQuery(
-                    "rcsb_entity_source_organism.ncbi_scientific_name",
-                    operator="exact_match",
-                    value="Homo sapiens",
-                )
-                list(query(sort=Sort(sort_by="rcsb_assembly_info.polymer_entity_count", direction="asc", filter=tf)))
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
-
+            result("with TerminalFilter")
             # Group Filter
-            try:
-                tf1 = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.aggregation_method", operator="exact_match", value="electron microscopy")
-                tf2 = TerminalFilter(attribute="rcsb_polymer_entity_group_membership.similarity_cutoff", operator="equals", value=100)
-                gf = GroupFilter(logical_operator="and", nodes=[tf1, tf2])
-                query = AttributeQuery(
-                    "rcsb_entity_source_organism.ncbi_scientific_name",
-                    operator="exact_match",
-                    value="Homo sapiens",
-                )
-                list(query(sort=Sort(sort_by="rcsb_assembly_info.polymer_entity_count", direction="asc", filter=gf)))
-            except Exception as error:
-                self.fail(f"Failed unexpectedly: {error}")
+            result("with GroupFilter")
 
     def testReturnExplainMetadata(self):
         query = AttributeQuery("rcsb_entity_source_organism.ncbi_scientific_name", operator="exact_match", value="Homo sapiens")
@@ -1482,45 +1387,3 @@ class SearchTests(unittest.TestCase):
             query(scoring_strategy="text")
         except Exception as error:
             self.fail(f"Failed unexpectedly: {error}")
-
-
-def buildSearch():
-    suiteSelect = unittest.TestSuite()
-    suiteSelect.addTest(SearchTests("testConstruction"))
-    suiteSelect.addTest(SearchTests("testLargePagination"))
-    suiteSelect.addTest(SearchTests("testOperators"))
-    suiteSelect.addTest(SearchTests("testPartialQuery"))
-    suiteSelect.addTest(SearchTests("testFreeText"))
-    suiteSelect.addTest(SearchTests("testAttribute"))
-    suiteSelect.addTest(SearchTests("exampleQuery1"))
-    suiteSelect.addTest(SearchTests("exampleQuery2"))
-    suiteSelect.addTest(SearchTests("testMalformedQuery"))
-    suiteSelect.addTest(SearchTests("testPagination"))
-    suiteSelect.addTest(SearchTests("testXor"))
-    suiteSelect.addTest(SearchTests("testInversion"))
-    suiteSelect.addTest(SearchTests("testIterable"))
-    suiteSelect.addTest(SearchTests("testIquery"))
-    suiteSelect.addTest(SearchTests("testSingleQuery"))
-    suiteSelect.addTest(SearchTests("testChemSearch"))
-    suiteSelect.addTest(SearchTests("testMismatch"))
-    suiteSelect.addTest(SearchTests("testCSMquery"))
-    suiteSelect.addTest(SearchTests("testSequenceQuery"))
-    suiteSelect.addTest(SearchTests("testSeqMotifQuery"))
-    suiteSelect.addTest(SearchTests("testFileUpload"))
-    suiteSelect.addTest(SearchTests("testStructSimQuery"))
-    suiteSelect.addTest(SearchTests("testStructMotifQuery"))
-    suiteSelect.addTest(SearchTests("testChemSimilarityQuery"))
-    suiteSelect.addTest(SearchTests("testReturnCounts"))
-    suiteSelect.addTest(SearchTests("testResultsVerbosity"))
-    suiteSelect.addTest(SearchTests("testFacetQuery"))
-    suiteSelect.addTest(SearchTests("testGroupBy"))
-    suiteSelect.addTest(SearchTests("testGroupByReturnType"))
-    suiteSelect.addTest(SearchTests("testSort"))
-    suiteSelect.addTest(SearchTests("testReturnExplainMetadata"))
-    suiteSelect.addTest(SearchTests("testScoringStrategy"))
-    return suiteSelect
-
-
-if __name__ == "__main__":
-    mySuite = buildSearch()
-    unittest.TextTestRunner(verbosity=2).run(mySuite)